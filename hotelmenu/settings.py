@@ -127,6 +127,59 @@ STATIC_URL = 'static/'
 BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_GRACE_MINUTES = 60       # media cleanup leaves files used more recently (an import may reference them)
+
+# --- Menu import ---
+IMAGE_FETCH_TIMEOUT = 15        # seconds per image request
+IMAGE_FETCH_MAX_WORKERS = 16    # concurrent image downloads per import
+IMAGE_FETCH_PER_HOST = 4        # concurrent downloads against a single host
+IMAGE_FETCH_NEGATIVE_TTL = 3600 # seconds to skip URLs that failed or weren't images
+IMPORT_BATCH_SIZE = 500         # rows streamed, fetched and bulk-written per batch
+IMPORT_JOB_STALE_MINUTES = 15   # a running job without progress for this long is marked failed
+
+# --- Image renditions (menuapp.imaging) ---
+IMAGE_VARIANT_WIDTHS = {'thumbnail': 200, 'medium': 600, 'large': 1200}
+IMAGE_VARIANT_QUALITY = 80
+
+# --- Time-window manual categories (menuapp.schedule) ---
+MENU_TIME_ZONE = 'Asia/Kuwait'
+
+# --- Response cache (menuapp.response_cache) ---
+# The 'menu' cache holds public API responses. LocMemCache is per process;
+# to share entries between workers switch it to the file-based backend:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache' / 'menu',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'menu': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'menu-responses',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+MENU_CACHE_ALIAS = 'menu'
+
+# --- Delta sync (/api/sync/, menuapp.sync) ---
+SYNC_TOMBSTONE_DAYS = 90     # deletions remembered; older sync tokens get a full reset
+SYNC_OVERLAP_SECONDS = 60    # tokens lag this far behind so in-flight writes aren't missed
+
+# --- API keys (menuapp.middleware.APIKeyMiddleware, menuapp.api_keys) ---
+# Active keys are cached per process for this long (0 = query on every
+# request). Changes in the admin apply at once in the process that made
+# them and within the TTL elsewhere; set API_KEY_CACHE_ALIAS to a shared
+# cache to have other workers reload from it instead of the database.
+API_KEY_CACHE_SECONDS = 60
+API_KEY_CACHE_ALIAS = None
+
+# --- Per-app rate limits (menuapp.ratelimit), defaults for AllowedApp rows that leave them empty ---
+RATE_LIMIT_PER_MINUTE = 120      # token bucket refill rate; 0 = unlimited
+RATE_LIMIT_BURST = 30            # bucket size
+RATE_LIMIT_DAILY_QUOTA = None    # requests per day (TIME_ZONE days); None = unlimited
+# Counters are per process; name a shared cache (memcached/redis) to limit across workers
+RATE_LIMIT_CACHE_ALIAS = None
 
 
 
@@ -144,7 +197,11 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    )
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'menuapp.renderers.FastJSONRenderer',  # orjson when installed, stock JSON otherwise
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Hotel, ManualCategory, MenuItem, AllowedApp, Category
+from .models import Hotel, ImageFetch, ImportJob, ManualCategory, MenuItem, AllowedApp, Category, Tombstone
 
 
 @admin.register(Hotel)
@@ -31,10 +31,29 @@ class MenuItemAdmin(admin.ModelAdmin):
 
 @admin.register(AllowedApp)
 class AllowedAppAdmin(admin.ModelAdmin):
-    list_display = ('app_name', 'api_key', 'is_active', 'created_at')
+    list_display = ('app_name', 'api_key', 'is_active', 'rate_per_minute', 'burst', 'daily_quota', 'created_at')
     readonly_fields = ('api_key',)
     
 @admin.register(ManualCategory)
 class ManualCategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'created_at')
-    search_fields = ('name',)
\ No newline at end of file
+    list_display = ('name', 'start_time', 'end_time', 'created_at')
+    search_fields = ('name',)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('hotel_name', 'status', 'rows_parsed', 'images_fetched', 'items_imported', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('hotel_name',)
+
+
+@admin.register(ImageFetch)
+class ImageFetchAdmin(admin.ModelAdmin):
+    list_display = ('url', 'local_path', 'failed_until', 'error', 'fetched_at')
+    search_fields = ('url',)
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'hotel_id', 'deleted_at')
+    list_filter = ('kind',)
@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import AllowedApp
+
+SHARED_KEY = "api-keys:apps"
+
+# What a request needs to know about its app; limits are None for the RATE_LIMIT_* defaults
+AppKey = namedtuple("AppKey", "id name rate_per_minute burst daily_quota")
+APP_FIELDS = ("pk", "app_name", "rate_per_minute", "burst", "daily_quota")
+
+_lock = threading.Lock()
+_keys = None  # {sha256(api key): AppKey} of active apps
+_loaded_at = 0.0
+
+
+def hash_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _shared_cache():
+    alias = getattr(settings, "API_KEY_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def _load():
+    """Active keys from the shared cache if there is one, else one query."""
+    shared = _shared_cache()
+    keys = shared.get(SHARED_KEY) if shared else None
+    if keys is None:
+        keys = {
+            hash_key(api_key): AppKey(*app)
+            for api_key, *app in AllowedApp.objects.filter(is_active=True).values_list("api_key", *APP_FIELDS)
+        }
+        if shared:
+            # Expires like the per-process copy, so a missed invalidation can't outlive API_KEY_CACHE_SECONDS
+            shared.set(SHARED_KEY, keys, timeout=getattr(settings, "API_KEY_CACHE_SECONDS", 60))
+    return keys
+
+
+def active_keys() -> dict:
+    """Hashed active keys, reloaded every API_KEY_CACHE_SECONDS."""
+    global _keys, _loaded_at
+    ttl = getattr(settings, "API_KEY_CACHE_SECONDS", 60)
+    if _keys is None or time.monotonic() - _loaded_at >= ttl:
+        with _lock:
+            if _keys is None or time.monotonic() - _loaded_at >= ttl:
+                _keys = _load()
+                _loaded_at = time.monotonic()
+    return _keys
+
+
+def find_app(api_key: str):
+    """
+    The AppKey of an active key, else None. Keys are looked up by
+    SHA-256 digest, so neither the raw keys are held in memory nor does the
+    lookup time depend on how much of a guessed key is right. With
+    API_KEY_CACHE_SECONDS = 0 every call asks the database.
+    """
+    if not api_key:
+        return None
+    if getattr(settings, "API_KEY_CACHE_SECONDS", 60) <= 0:
+        app = AllowedApp.objects.filter(api_key=api_key, is_active=True).values_list(*APP_FIELDS).first()
+        return AppKey(*app) if app else None
+    return active_keys().get(hash_key(api_key))
+
+
+def invalidate_api_keys():
+    """Forget cached keys (menuapp.signals calls this when an AllowedApp changes)."""
+    global _keys
+    with _lock:
+        _keys = None
+    shared = _shared_cache()
+    if shared:
+        shared.delete(SHARED_KEY)
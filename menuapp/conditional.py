@@ -0,0 +1,49 @@
+import hashlib
+
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import MenuVersion
+
+
+class MenuVersionConditionalMixin:
+    """
+    Conditional GET for read APIs. The ETag and Last-Modified come from the
+    MenuVersion stamps the view depends on, so If-None-Match /
+    If-Modified-Since are answered with 304 before any queryset or
+    serializer runs. The stamps read are kept on `self.menu_stamps`.
+    """
+
+    def menu_version_keys(self, request, *args, **kwargs):
+        return [MenuVersion.GLOBAL]
+
+    def menu_validators(self, request, stamps):
+        """(etag, last_modified) for this request, or None to skip conditional handling."""
+        parts = [f"{key}:{stamp.version}" for key, stamp in sorted(stamps.items())]
+        return self.make_etag(request, parts), max((s.updated_at for s in stamps.values() if s.updated_at), default=None)
+
+    @staticmethod
+    def make_etag(request, parts):
+        # Same URL in another format (browsable API vs JSON) is a different representation
+        parts = [*parts, request.get_full_path(), request.META.get("HTTP_ACCEPT", "")]
+        return hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:32]
+
+    def get(self, request, *args, **kwargs):
+        self.menu_stamps = MenuVersion.stamps(self.menu_version_keys(request, *args, **kwargs))
+        validators = self.menu_validators(request, self.menu_stamps)
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        self.menu_etag = etag
+        view = condition(
+            etag_func=lambda *a, **kw: etag,
+            last_modified_func=lambda *a, **kw: last_modified,
+        )(self.menu_response)
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    def menu_response(self, request, *args, **kwargs):
+        """Full response, built only when the client's copy is stale."""
+        return super().get(request, *args, **kwargs)
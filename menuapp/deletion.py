@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Hotel, MenuItem, Tombstone
+from .signals import bump_menu_version
+from .storage import schedule_file_cleanup
+from .sync import record_tombstones
+
+# _raw_delete() below is a bare DELETE: no cascades, no signals. That is safe
+# only because these are all the relations of the tables it deletes from, and
+# each is handled here by hand (link rows deleted first, a hotel's items before
+# the hotel). A new FK or M2M pointing at these models would otherwise be left
+# dangling without any error, so check_relations() refuses to run instead.
+HANDLED_RELATIONS = {
+    MenuItem: {"categories", "manual_categories"},
+    Hotel: {"menu_items"},
+}
+
+
+def check_relations(model):
+    """Raise if `model` has relations set-based deletion doesn't know how to clean up."""
+    found = {rel.get_accessor_name() for rel in model._meta.related_objects}
+    found |= {field.name for field in model._meta.many_to_many}
+    unknown = found - HANDLED_RELATIONS[model]
+    if unknown:
+        raise RuntimeError(
+            f"{model._meta.label} has relations {sorted(unknown)} that menuapp.deletion doesn't delete; "
+            "handle them there before using _raw_delete()."
+        )
+
+
+def delete_items(items):
+    """
+    Delete the (unsliced) MenuItem queryset `items` with one DELETE per table.
+    Per-row signals don't fire, so tombstones and menu versions are recorded
+    here. Returns (items deleted, their image names, their hotel ids).
+    """
+    check_relations(MenuItem)
+    rows = list(items.values_list("pk", "hotel_id", "image_local"))
+    if not rows:
+        return 0, [], set()
+
+    by_hotel = defaultdict(list)
+    for pk, hotel_id, _ in rows:
+        by_hotel[hotel_id].append(pk)
+
+    for through in (MenuItem.categories.through, MenuItem.manual_categories.through):
+        through.objects.filter(menuitem_id__in=items.values("pk")).delete()
+    deleted = items._raw_delete(items.db)
+
+    for hotel_id, pks in by_hotel.items():
+        record_tombstones(Tombstone.KIND_ITEM, pks, hotel_id=hotel_id)
+    bump_menu_version(by_hotel)
+    return deleted, [image for _, _, image in rows], set(by_hotel)
+
+
+def delete_menu_items(ids) -> dict:
+    """
+    Delete menu items by id in a handful of queries. Their image files are
+    removed after commit by the cleanup thread, unless something else still
+    uses them.
+    """
+    with transaction.atomic():
+        deleted, images, _ = delete_items(MenuItem.objects.filter(pk__in=ids))
+        queued = schedule_file_cleanup(images)
+    return {"deleted": deleted, "images_queued": queued}
+
+
+def delete_hotels(ids) -> dict:
+    """Delete hotels with all their menu items, set-based like delete_menu_items (logos included)."""
+    with transaction.atomic():
+        check_relations(Hotel)
+        hotels = Hotel.objects.filter(pk__in=ids)
+        logos = dict(hotels.values_list("pk", "logo"))
+        if not logos:
+            return {"hotels": 0, "items": 0, "images_queued": 0}
+
+        items, images, _ = delete_items(MenuItem.objects.filter(hotel_id__in=list(logos)))
+        deleted = hotels._raw_delete(hotels.db)
+        record_tombstones(Tombstone.KIND_HOTEL, list(logos))
+        bump_menu_version(logos)
+        queued = schedule_file_cleanup([*images, *logos.values()])
+    return {"hotels": deleted, "items": items, "images_queued": queued}
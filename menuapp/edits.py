@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .deletion import delete_items
+from .models import Category, ManualCategory, MenuItem
+from .signals import bump_menu_version, categories_relinked
+from .storage import schedule_file_cleanup
+
+# "type" of a categories op -> (M2M through model, its category column, category model)
+CATEGORY_LINKS = {
+    "auto": (MenuItem.categories.through, "category_id", Category),
+    "manual": (MenuItem.manual_categories.through, "manualcategory_id", ManualCategory),
+}
+
+
+def _ids(value, field="ids"):
+    if not isinstance(value, list):
+        raise ValueError(f"{field} must be a list of integers.")
+    try:
+        return list(dict.fromkeys(int(pk) for pk in value))
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a list of integers.")
+
+
+def parse_ops(ops) -> list:
+    """
+    Validate a batch of edit ops before anything is written. Each op is one of
+      {"op": "visibility", "ids": [...], "visible": true}
+      {"op": "categories", "ids": [...], "type": "auto" | "manual", "category_ids": [...]}
+      {"op": "delete", "ids": [...]}
+    Raises ValueError naming the first bad op.
+    """
+    if not isinstance(ops, list) or not ops:
+        raise ValueError("ops must be a non-empty list.")
+    parsed = []
+    for index, op in enumerate(ops):
+        try:
+            if not isinstance(op, dict):
+                raise ValueError("must be an object.")
+            kind = op.get("op")
+            entry = {"op": kind, "ids": _ids(op.get("ids"))}
+            if kind == "visibility":
+                if not isinstance(op.get("visible"), bool):
+                    raise ValueError("visible must be true or false.")
+                entry["visible"] = op["visible"]
+            elif kind == "categories":
+                if op.get("type") not in CATEGORY_LINKS:
+                    raise ValueError("type must be 'auto' or 'manual'.")
+                entry["type"] = op["type"]
+                entry["category_ids"] = _ids(op.get("category_ids", []), "category_ids")
+                model = CATEGORY_LINKS[op["type"]][2]
+                unknown = set(entry["category_ids"]) - set(
+                    model.objects.filter(pk__in=entry["category_ids"]).values_list("pk", flat=True)
+                )
+                if unknown:
+                    raise ValueError(f"unknown category ids {sorted(unknown)}.")
+            elif kind != "delete":
+                raise ValueError("op must be 'visibility', 'categories' or 'delete'.")
+        except ValueError as e:
+            raise ValueError(f"ops[{index}]: {e}")
+        parsed.append(entry)
+    return parsed
+
+
+def _existing(ids):
+    """{item id: hotel id} for the ids that exist."""
+    return dict(MenuItem.objects.filter(pk__in=ids).values_list("pk", "hotel_id"))
+
+
+def _set_visibility(ids, visible):
+    found = _existing(ids)
+    changed = MenuItem.objects.filter(pk__in=list(found)).exclude(is_visible=visible).update(
+        is_visible=visible, updated_at=timezone.now()
+    )
+    if changed:
+        bump_menu_version(set(found.values()))
+    return found, {"changed": changed}
+
+
+def _set_categories(ids, type_, category_ids):
+    """Replace the items' categories of one type: one DELETE and one bulk INSERT on the link table."""
+    through, column, _ = CATEGORY_LINKS[type_]
+    found = _existing(ids)
+    links = through.objects.filter(menuitem_id__in=list(found))
+    current = set(links.values_list("menuitem_id", column))
+    wanted = {(pk, category_id) for pk in found for category_id in category_ids}
+
+    removed, _ = links.exclude(**{f"{column}__in": category_ids}).delete() if current - wanted else (0, None)
+    added = through.objects.bulk_create(
+        [through(menuitem_id=pk, **{column: category_id}) for pk, category_id in wanted - current],
+        batch_size=500,
+    )
+    # Link-table writes send no m2m_changed: do what menuapp.signals would
+    touched = {pk for pk, _ in (current ^ wanted)}
+    if touched:
+        categories_relinked(touched)
+        bump_menu_version({found[pk] for pk in touched})
+    return found, {"added": len(added), "removed": removed}
+
+
+def _delete(ids):
+    found = _existing(ids)
+    deleted, images, _ = delete_items(MenuItem.objects.filter(pk__in=list(found)))
+    return found, {"deleted": deleted, "images_queued": schedule_file_cleanup(images)}
+
+
+def apply_menu_edits(ops) -> list:
+    """
+    Apply parsed ops (parse_ops) in order, in one transaction, with
+    set-based writes. Returns one result per op: its counts plus the ids
+    that matched no item (e.g. deleted by an earlier op).
+    """
+    results = []
+    with transaction.atomic():
+        for op in ops:
+            if op["op"] == "visibility":
+                found, result = _set_visibility(op["ids"], op["visible"])
+            elif op["op"] == "categories":
+                found, result = _set_categories(op["ids"], op["type"], op["category_ids"])
+            else:
+                found, result = _delete(op["ids"])
+            results.append({
+                "op": op["op"],
+                "matched": len(found),
+                **result,
+                "missing": [pk for pk in op["ids"] if pk not in found],
+            })
+    return results
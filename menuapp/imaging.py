@@ -0,0 +1,88 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .signals import bump_menu_version
+from .storage import content_store, variant_name
+
+
+def _write_image(img, name, fmt, **params):
+    """Encode `img` into the media store at `name` (atomic rename, like content_store)."""
+    full_path = content_store.path(name)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path), prefix=".incoming-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            img.save(tmp, fmt, **params)
+        os.replace(tmp_path, full_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def build_variants(name: str, force: bool = False) -> dict:
+    """
+    Render fixed-width copies of stored image `name` for every size in
+    IMAGE_VARIANT_WIDTHS, each as JPEG (PNG when the image has transparency)
+    plus WebP. Sizes wider than the original are skipped, as are animated
+    images. Existing renditions are reused unless `force`.
+
+    Returns {size: {"width": .., "src": path, "webp": path}} for MenuItem.image_variants.
+    """
+    if not name:
+        return {}
+
+    widths = getattr(settings, "IMAGE_VARIANT_WIDTHS", {})
+    quality = getattr(settings, "IMAGE_VARIANT_QUALITY", 80)
+
+    try:
+        with Image.open(content_store.path(name)) as source:
+            if getattr(source, "n_frames", 1) > 1:
+                return {}
+            img = ImageOps.exif_transpose(source)
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            img = img.convert("RGBA" if has_alpha else "RGB")
+
+            fmt, ext = ("PNG", "png") if has_alpha else ("JPEG", "jpg")
+            variants = {}
+            for size, width in sorted(widths.items(), key=lambda kv: kv[1]):
+                if width >= img.width:
+                    continue
+                src = variant_name(name, size, ext)
+                webp = variant_name(name, size, "webp")
+                if force or not (content_store.exists(src) and content_store.exists(webp)):
+                    height = max(1, round(img.height * width / img.width))
+                    resized = img.resize((width, height), Image.LANCZOS)
+                    if fmt == "JPEG":
+                        _write_image(resized, src, fmt, quality=quality, optimize=True, progressive=True)
+                    else:
+                        _write_image(resized, src, fmt, optimize=True)
+                    _write_image(resized, webp, "WEBP", quality=quality, method=4)
+                variants[size] = {"width": width, "src": src, "webp": webp}
+            return variants
+    except Exception as e:
+        print(f"[Image Variant Error] {name} | Error: {e}")
+        return {}
+
+
+def build_variants_many(names, max_workers: int = None, force: bool = False) -> dict:
+    """build_variants() for many images on a thread pool; returns {name: variants}."""
+    names = [n for n in dict.fromkeys(names) if n]
+    if not names:
+        return {}
+    max_workers = max_workers or min(4, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(names))) as pool:
+        return dict(zip(names, pool.map(lambda n: build_variants(n, force=force), names)))
+
+
+def refresh_item_variants(item):
+    """Re-render a saved MenuItem's image variants after its image changed."""
+    item.image_variants = build_variants(item.image_local.name) if item.image_local else {}
+    item.updated_at = timezone.now()
+    type(item).objects.filter(pk=item.pk).update(image_variants=item.image_variants, updated_at=item.updated_at)
+    bump_menu_version([item.hotel_id])
@@ -0,0 +1,633 @@
+import os
+import time
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from openpyxl import load_workbook
+from slugify import slugify
+
+from .models import Category, Hotel, ImportJob, MenuItem, normalize_name
+from .deletion import delete_items
+from .imaging import build_variants_many
+from .search import refresh_search_categories
+from .signals import bump_menu_version
+from .storage import schedule_file_cleanup
+from .sync import touch_items
+from .utils import download_image, fetch_images
+
+# Accepted header names per column (lowercased), first match wins
+HEADER_ALIASES = {
+    "name": ["_nameen", "name", "item", "itemname", "item_name"],
+    "price": ["_finalprice", "_regularprice", "price", "regularprice", "cost"],
+    "category": ["_categories", "category", "type"],
+    "description": ["_shortdescen", "description", "desc", "details", "item_description"],
+    "image": ["_imageurl1", "image", "image_url", "imageurl", "image link", "image_link"],
+    "logo": ["_hotellogo", "logo", "hotel_logo"],
+}
+
+# Keep the stored skip list bounded for very broken files
+MAX_SKIPPED_REASONS = 1000
+
+# Seconds between progress writes while images download
+PROGRESS_INTERVAL = 1.0
+
+MenuRow = namedtuple("MenuRow", "row_number name price categories description image_url")
+
+
+class WorkbookError(Exception):
+    """Raised when an uploaded workbook cannot be imported at all."""
+
+
+def hotel_name_from_filename(filename: str) -> str:
+    """'menu_data_<Hotel Name>.xlsx' -> '<Hotel Name>'"""
+    name = os.path.splitext(os.path.basename(filename))[0]
+    for prefix in ("menu_data_", "menu-data-"):
+        if prefix in name:
+            name = name.split(prefix)[-1]
+    return name.strip() or os.path.splitext(os.path.basename(filename))[0]
+
+
+def open_workbook(path: str):
+    """
+    Open a workbook in read-only streaming mode, re-saving it through pandas
+    once if openpyxl rejects it.
+    """
+    try:
+        return load_workbook(path, read_only=True, data_only=True)
+    except Exception:
+        try:
+            df = pd.read_excel(path, engine="openpyxl")
+            df.to_excel(path, index=False, engine="openpyxl")
+            return load_workbook(path, read_only=True, data_only=True)
+        except Exception:
+            raise WorkbookError("Invalid Excel file. Please re-save properly.")
+
+
+def _save_progress(job, **fields):
+    """
+    Persist progress counters on the job so status polling sees them right
+    away. Each write is also the job's heartbeat (see fail_stale_jobs).
+    """
+    if job is None:
+        return
+    fields["heartbeat_at"] = timezone.now()
+    for field, value in fields.items():
+        setattr(job, field, value)
+    ImportJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def _cell(row, idx):
+    if idx is None or idx >= len(row):
+        return None
+    return row[idx]
+
+
+def parse_sheet(sheet, skip, meta):
+    """
+    Stream MenuRow tuples from a read-only sheet, one row in memory at a time.
+    Bad rows are reported through `skip(row_number, reason)`; the hotel logo
+    URL from the first data row is stored in `meta["logo_url"]`. Raises
+    WorkbookError if there is no recognizable name column.
+    """
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None) or ()
+    headers = [str(value).strip().lower() if value else "" for value in header]
+
+    def find_col(key):
+        for name in HEADER_ALIASES[key]:
+            if name in headers:
+                return headers.index(name)
+        return None
+
+    idx_name = find_col("name")
+    if idx_name is None:
+        raise WorkbookError(f"No item name column found (expected one of: {', '.join(HEADER_ALIASES['name'])}).")
+    idx_price = find_col("price")
+    idx_category = find_col("category")
+    idx_description = find_col("description")
+    idx_image = find_col("image")
+    idx_logo = find_col("logo")
+
+    for i, row in enumerate(rows, start=2):
+        meta["rows_parsed"] = meta.get("rows_parsed", 0) + 1
+        try:
+            if i == 2 and _cell(row, idx_logo):
+                meta["logo_url"] = str(_cell(row, idx_logo)).strip()
+
+            name = _cell(row, idx_name)
+            if not name:
+                skip(i, "No name")
+                continue
+            name = str(name).strip()
+
+            price = None
+            if _cell(row, idx_price) is not None:
+                try:
+                    price = float(_cell(row, idx_price))
+                except (TypeError, ValueError):
+                    skip(i, "Invalid price")
+
+            cat_names = []
+            if _cell(row, idx_category) is not None:
+                cat_cell = str(_cell(row, idx_category)).strip()
+                cat_names = [c.strip() for c in cat_cell.split(",") if c.strip()]
+
+            description = str(_cell(row, idx_description)).strip() if _cell(row, idx_description) else None
+            image_url = str(_cell(row, idx_image)).strip() if _cell(row, idx_image) else None
+
+            yield MenuRow(i, name, price, cat_names, description, image_url)
+        except Exception as e:
+            skip(i, str(e))
+
+
+def _batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _categories_by_name(names) -> dict:
+    """Fetch-or-create categories in bulk; returns {name: Category}."""
+    names = set(names)
+    if not names:
+        return {}
+    found = {c.name: c for c in Category.objects.filter(name__in=names)}
+    missing = names - found.keys()
+    if missing:
+        Category.objects.bulk_create([Category(name=n) for n in missing], ignore_conflicts=True)
+        found.update({c.name: c for c in Category.objects.filter(name__in=missing)})
+    return found
+
+
+def _write_batch(hotel, batch, images, variants, outcome):
+    """
+    Replace-mode write of one batch with a fixed number of queries:
+    one lookup for existing items, one bulk_create, one bulk_update and one
+    bulk insert of category through rows (plus category fetch-or-create).
+    Items from before this import with a name in the batch are deleted and
+    recreated from the sheet in the same transaction; rows whose name this
+    import already wrote (same normalized name) are merged: categories are
+    added and missing fields filled in. Returns (rows written, items deleted).
+    """
+    categories = _categories_by_name(c for row in batch for c in row.categories)
+
+    existing = {}
+    replaced = []
+    for item in MenuItem.objects.filter(
+        hotel=hotel, normalized_name__in={normalize_name(row.name) for row in batch}
+    ).order_by("pk"):
+        if item.pk in outcome:
+            existing.setdefault(item.normalized_name, item)
+        else:
+            replaced.append(item.pk)
+
+    to_create = {}   # normalized name -> new MenuItem
+    to_update = {}   # pk -> existing MenuItem
+    item_categories = {}  # normalized name -> set of category ids
+
+    for row in batch:
+        key = normalize_name(row.name)
+        image_local = images.get(row.image_url) if row.image_url else None
+        item = existing.get(key) or to_create.get(key)
+
+        if item is None:
+            to_create[key] = MenuItem(
+                hotel=hotel,
+                item_name=row.name,
+                normalized_name=key,
+                price=row.price,
+                description=row.description,
+                image_url=row.image_url,
+                image_local=image_local,
+                image_variants=variants.get(image_local, {}),
+            )
+        else:
+            # Same name seen again: fill missing fields only
+            if not item.description and row.description:
+                item.description = row.description
+            if not item.image_url and row.image_url:
+                item.image_url = row.image_url
+            if not item.image_local and image_local:
+                item.image_local = image_local
+                item.image_variants = variants.get(image_local, {})
+            if not item.price and row.price:
+                item.price = row.price
+            if item.pk:
+                to_update[item.pk] = item
+
+        item_categories.setdefault(key, set()).update(categories[c].pk for c in row.categories)
+
+    with transaction.atomic():
+        deleted = _delete_items(MenuItem.objects.filter(pk__in=replaced)) if replaced else 0
+        MenuItem.objects.bulk_create(to_create.values())
+        if to_update:
+            # bulk_update skips auto_now
+            now = timezone.now()
+            for item in to_update.values():
+                item.updated_at = now
+            MenuItem.objects.bulk_update(
+                to_update.values(), ["description", "image_url", "image_local", "image_variants", "price", "updated_at"]
+            )
+
+        Through = MenuItem.categories.through
+        links = [
+            Through(menuitem_id=(existing.get(key) or to_create[key]).pk, category_id=cat_id)
+            for key, cat_ids in item_categories.items()
+            for cat_id in cat_ids
+        ]
+        Through.objects.bulk_create(links, ignore_conflicts=True)
+        # bulk writes send no model signals
+        refresh_search_categories({link.menuitem_id for link in links})
+        bump_menu_version([hotel.pk])
+
+    for item in to_create.values():
+        outcome[item.pk] = "created"
+    return len(batch), deleted
+
+
+def _as_price(value):
+    """Row price as stored by MenuItem.price (3 decimal places), for comparisons."""
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal("0.001"))
+
+
+def _merge_rows(rows):
+    """Collapse rows sharing a normalized name: first row wins, later rows fill gaps."""
+    first = rows[0]
+    merged = {
+        "item_name": first.name,
+        "price": _as_price(first.price),
+        "description": first.description,
+        "image_url": first.image_url,
+        "categories": set(first.categories),
+    }
+    for row in rows[1:]:
+        if not merged["description"] and row.description:
+            merged["description"] = row.description
+        if not merged["image_url"] and row.image_url:
+            merged["image_url"] = row.image_url
+        if not merged["price"] and row.price:
+            merged["price"] = _as_price(row.price)
+        merged["categories"].update(row.categories)
+    return merged
+
+
+def _sync_batch(hotel, batch, index, outcome, fetch) -> int:
+    """
+    Sync-mode upsert of one batch against the hotel's existing items.
+
+    Rows are matched to items by normalized name (`index`, see _name_index).
+    Matched items get only their changed fields written and keep `is_visible`
+    and manual categories; images are only downloaded for new or changed
+    image URLs. Auto categories follow the sheet. `outcome` records
+    created/updated/unchanged per item pk.
+    """
+    grouped = {}
+    for row in batch:
+        grouped.setdefault(normalize_name(row.name), []).append(row)
+    targets = {key: _merge_rows(rows) for key, rows in grouped.items()}
+    matched = {
+        key: _match(index[key], target["item_name"], outcome) for key, target in targets.items() if key in index
+    }
+
+    categories = _categories_by_name(c for t in targets.values() for c in t["categories"])
+    existing = MenuItem.objects.in_bulk(list(matched.values()))
+
+    Through = MenuItem.categories.through
+    current_links = {}  # item pk -> {category id: through row id}
+    for link_id, item_id, cat_id in Through.objects.filter(menuitem_id__in=existing).values_list(
+        "id", "menuitem_id", "category_id"
+    ):
+        current_links.setdefault(item_id, {})[cat_id] = link_id
+
+    # Only fetch images that are new or whose URL changed
+    wanted = set()
+    for key, target in targets.items():
+        url = target["image_url"]
+        item = existing.get(matched.get(key))
+        if not url:
+            continue
+        if item is not None:
+            if item.image_url == url and item.image_local:
+                continue
+            if item.pk in outcome and item.image_url and item.image_url != url:
+                continue  # duplicate row only fills gaps; this URL won't be used
+        wanted.add(url)
+    images = fetch(sorted(wanted))
+    variants = build_variants_many(images.values())
+
+    to_create = {}
+    to_update = {}
+    relinked = []  # pks whose only change is their categories
+    links_to_add = []
+    links_to_remove = []
+
+    for key, target in targets.items():
+        item = existing.get(matched.get(key))
+        cat_ids = {categories[c].pk for c in target["categories"]}
+
+        if item is None:
+            image_local = images.get(target["image_url"]) if target["image_url"] else None
+            to_create[key] = MenuItem(
+                hotel=hotel,
+                item_name=target["item_name"],
+                normalized_name=key,
+                price=target["price"],
+                description=target["description"],
+                image_url=target["image_url"],
+                image_local=image_local,
+                image_variants=variants.get(image_local, {}),
+            )
+            continue
+
+        linked = current_links.get(item.pk, {})
+        changed = False
+
+        if item.pk in outcome:
+            # Already written earlier in this import (duplicate row): fill gaps only
+            for field in ("price", "description", "image_url"):
+                if not getattr(item, field) and target[field]:
+                    setattr(item, field, target[field])
+                    changed = True
+            if item.image_url and not item.image_local and images.get(item.image_url):
+                item.image_local = images[item.image_url]
+                item.image_variants = variants.get(item.image_local, {})
+                changed = True
+            links_to_add += [(item.pk, c) for c in cat_ids - linked.keys()]
+        else:
+            for field in ("item_name", "price", "description"):
+                if getattr(item, field) != target[field]:
+                    setattr(item, field, target[field])
+                    changed = True
+            item.normalized_name = key
+
+            url = target["image_url"]
+            if url != (item.image_url or None):
+                item.image_url = url
+                item.image_local = images.get(url) if url else None
+                item.image_variants = variants.get(item.image_local, {})
+                changed = True
+            elif url and not item.image_local and images.get(url):
+                item.image_local = images[url]
+                item.image_variants = variants.get(item.image_local, {})
+                changed = True
+            # No URL on either side: keep any manually uploaded image
+
+            links_to_add += [(item.pk, c) for c in cat_ids - linked.keys()]
+            links_to_remove += [(item.pk, link_id) for c, link_id in linked.items() if c not in cat_ids]
+
+        if changed:
+            to_update[item.pk] = item
+        elif cat_ids != linked.keys():
+            relinked.append(item.pk)
+        if changed or cat_ids != linked.keys():
+            outcome[item.pk] = "created" if outcome.get(item.pk) == "created" else "updated"
+        else:
+            outcome.setdefault(item.pk, "unchanged")
+
+    with transaction.atomic():
+        MenuItem.objects.bulk_create(to_create.values())
+        if to_update:
+            # bulk_update skips auto_now
+            now = timezone.now()
+            for item in to_update.values():
+                item.updated_at = now
+            MenuItem.objects.bulk_update(
+                to_update.values(),
+                ["item_name", "normalized_name", "price", "description", "image_url", "image_local", "image_variants",
+                 "updated_at"],
+            )
+        for key, item in to_create.items():
+            index[key] = {item.item_name: item.pk}
+            outcome[item.pk] = "created"
+            links_to_add += [(item.pk, categories[c].pk) for c in targets[key]["categories"]]
+        if links_to_remove:
+            Through.objects.filter(pk__in=[link_id for _, link_id in links_to_remove]).delete()
+        Through.objects.bulk_create(
+            [Through(menuitem_id=item_id, category_id=cat_id) for item_id, cat_id in links_to_add],
+            ignore_conflicts=True,
+        )
+        # bulk writes send no model signals
+        refresh_search_categories({item_id for item_id, _ in links_to_add + links_to_remove})
+        touch_items(relinked)
+        bump_menu_version([hotel.pk])
+
+    return len(batch)
+
+
+def import_menu(path: str, hotel_name: str, job: ImportJob = None, mode: str = ImportJob.MODE_SYNC) -> dict:
+    """
+    Import an .xlsx menu for `hotel_name`.
+
+    mode="sync" diffs the sheet against the hotel's current items: rows are
+    matched by normalized name, only changed items are written, items missing
+    from the sheet are deleted, and visibility/manual categories survive.
+    mode="replace" rebuilds the hotel's menu from the sheet: items are
+    recreated batch by batch and the rest of the old menu is deleted once
+    every batch is written, so an import that dies midway never leaves a
+    partial or empty menu behind.
+
+    The sheet is streamed in read-only mode and processed in batches of
+    IMPORT_BATCH_SIZE rows: each batch has its images fetched concurrently and
+    is then written with bulk queries, so memory and queries per batch stay
+    constant however long the sheet is.
+    Progress (rows parsed, images fetched, skipped rows) is recorded on `job` if given.
+    A sheet without a name column or without a single importable row raises
+    WorkbookError and changes nothing.
+    Returns a summary dict including created/updated/unchanged/deleted counts.
+    """
+    batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 500)
+    hotel_slug = slugify(hotel_name)
+    wb = open_workbook(path)
+
+    skipped = []
+
+    def skip(row_number, reason):
+        if len(skipped) < MAX_SKIPPED_REASONS:
+            skipped.append({"row": row_number, "reason": reason})
+
+    meta = {}
+    progress = {"images_total": 0, "images_fetched": 0, "saved_at": time.monotonic()}
+
+    def fetch(urls):
+        offset = progress["images_fetched"]
+        progress["images_total"] += len(urls)
+        _save_progress(job, images_total=progress["images_total"])
+
+        def on_image_done(done, total):
+            # Throttled by time, so progress writes don't grow with the number of images
+            now = time.monotonic()
+            if done == total or now - progress["saved_at"] >= PROGRESS_INTERVAL:
+                progress["saved_at"] = now
+                _save_progress(job, images_fetched=offset + done)
+
+        images = fetch_images(urls, hotel_slug, on_done=on_image_done)
+        progress["images_fetched"] += len(urls)
+        return images
+
+    imported = 0
+    deleted = 0
+    outcome = {}  # item pk -> "created" | "updated" | "unchanged"
+    index = None
+    hotel = None
+    try:
+        for batch in _batched(parse_sheet(wb.active, skip, meta), batch_size):
+            _save_progress(job, rows_parsed=meta["rows_parsed"], skipped=skipped)
+
+            if hotel is None:
+                hotel = _prepare_hotel(hotel_name, meta.get("logo_url"))
+                index = _name_index(hotel)
+
+            if mode == ImportJob.MODE_REPLACE:
+                images = fetch([url for url in dict.fromkeys(row.image_url for row in batch) if url])
+                variants = build_variants_many(images.values())
+                written, replaced = _write_batch(hotel, batch, images, variants, outcome)
+                imported += written
+                deleted += replaced
+            else:
+                imported += _sync_batch(hotel, batch, index, outcome, fetch)
+            _save_progress(job, items_imported=imported)
+    finally:
+        wb.close()
+
+    if hotel is None:
+        # Nothing importable: never take that as "the menu is now empty"
+        _save_progress(job, rows_parsed=meta.get("rows_parsed", 0), skipped=skipped)
+        raise WorkbookError("No importable rows in the sheet; the current menu was left unchanged.")
+
+    # Only now that every batch is written: items not present in the sheet anymore,
+    # and duplicates (same normalized name) of matched ones. Replace mode already
+    # deleted the items it recreated, they just match nothing here.
+    stale = sorted({pk for names in index.values() for pk in names.values()} - outcome.keys())
+    for chunk in _batched(stale, batch_size):
+        deleted += _delete_items(MenuItem.objects.filter(pk__in=chunk))
+
+    counts = {"created": 0, "updated": 0, "unchanged": 0}
+    for status in outcome.values():
+        counts[status] += 1
+    counts["deleted"] = deleted
+
+    _save_progress(
+        job, rows_parsed=meta.get("rows_parsed", 0), items_imported=imported, skipped=skipped, summary=counts
+    )
+    return {
+        "hotel": hotel_name,
+        "mode": mode,
+        "rows_parsed": meta.get("rows_parsed", 0),
+        "items_imported": imported,
+        "images_fetched": progress["images_fetched"],
+        "skipped": skipped,
+        **counts,
+    }
+
+
+def _name_index(hotel) -> dict:
+    """
+    {normalized item name: {item name: pk}} for the hotel's current menu.
+    Older imports and manual adds allow several items per normalized name
+    ("Tea" and "tea"), so each key can hold more than one.
+    """
+    index = {}
+    for pk, name, key in MenuItem.objects.filter(hotel=hotel).values_list(
+        "pk", "item_name", "normalized_name"
+    ).order_by("pk"):
+        index.setdefault(key, {})[name] = pk
+    return index
+
+
+def _match(names, item_name, outcome):
+    """
+    The item a sheet row updates, from its `names` in the index: one already
+    written by this import, else the one with exactly this name, else the
+    oldest. Renaming the chosen item to `item_name` then can't collide with
+    another item of the hotel (the others are deleted as stale at the end).
+    """
+    for pk in names.values():
+        if pk in outcome:
+            return pk
+    return names.get(item_name, next(iter(names.values())))
+
+
+def _prepare_hotel(hotel_name, logo_url):
+    """Create/fetch the hotel and refresh its logo."""
+    logo_local = download_image(logo_url, slugify(hotel_name) + "_logo") if logo_url else None
+    with transaction.atomic():
+        hotel, _ = Hotel.objects.get_or_create(name=hotel_name)
+        if logo_local:
+            hotel.logo = logo_local
+            hotel.save()
+    return hotel
+
+
+def _delete_items(items) -> int:
+    """Set-based delete (menuapp.deletion); their image files are removed after commit if unused."""
+    with transaction.atomic():
+        deleted, images, _ = delete_items(items)
+        schedule_file_cleanup(images)
+    return deleted
+
+
+def process_job(job: ImportJob) -> ImportJob:
+    """Run a claimed import job to completion, recording the outcome on the job."""
+    try:
+        import_menu(job.file.path, job.hotel_name, job=job, mode=job.mode)
+        job.status = ImportJob.STATUS_DONE
+    except Exception as e:
+        print(f"[Import Job {job.pk} Error] {e}")
+        job.status = ImportJob.STATUS_FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at"])
+
+    # The uploaded workbook is only needed while the job runs
+    try:
+        job.file.delete(save=False)
+    except Exception as e:
+        print(f"[Import Job {job.pk} Cleanup Error] {e}")
+    return job
+
+
+def fail_stale_jobs() -> int:
+    """
+    Fail running jobs whose worker stopped writing progress for
+    IMPORT_JOB_STALE_MINUTES (killed, OOM, host restart): they would stay
+    "running" forever. They are failed rather than re-queued, since a file
+    that crashed a worker would crash the next one too. Returns how many.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(minutes=getattr(settings, "IMPORT_JOB_STALE_MINUTES", 15))
+    failed = ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    ).update(
+        status=ImportJob.STATUS_FAILED,
+        error="The import worker stopped responding. Upload the file again to retry.",
+        finished_at=now,
+    )
+    if failed:
+        print(f"[Import Job Error] {failed} stale running job(s) marked failed")
+    return failed
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running (failing stale ones first); returns it or None."""
+    fail_stale_jobs()
+    for job in ImportJob.objects.filter(status=ImportJob.STATUS_QUEUED).order_by("created_at", "pk")[:5]:
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(pk=job.pk, status=ImportJob.STATUS_QUEUED).update(
+            status=ImportJob.STATUS_RUNNING, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
@@ -0,0 +1,48 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from menuapp.api_keys import invalidate_api_keys
+from menuapp.middleware import APIKeyMiddleware
+from menuapp.models import AllowedApp
+from menuapp.ratelimit import reset_limits
+
+# (label, API_KEY_CACHE_SECONDS, RATE_LIMIT_PER_MINUTE); the limit is high enough never to refuse
+RUNS = (("off", 0, 0), ("on", 60, 0), ("on+limit", 60, 10 ** 9))
+
+
+class Command(BaseCommand):
+    help = "Per-request cost of APIKeyMiddleware: key cache off/on, and with rate limiting."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000, help="Requests per run")
+        parser.add_argument("--apps", type=int, default=50, help="Active apps (keys) to create")
+
+    def handle(self, *args, **opts):
+        factory = RequestFactory()
+        middleware = APIKeyMiddleware(lambda request: HttpResponse())
+        self.stdout.write(f"{'cache':>9} {'us/request':>11} {'queries':>8}")
+
+        with transaction.atomic():
+            keys = [AllowedApp.objects.create(app_name=f"Bench {n}", api_key=uuid.uuid4().hex).api_key
+                    for n in range(opts["apps"])]
+            requests = [factory.get("/api/hotels/", HTTP_X_APP_KEY=keys[n % len(keys)]) for n in range(opts["requests"])]
+
+            for label, ttl, rate in RUNS:
+                with override_settings(API_KEY_CACHE_SECONDS=ttl, RATE_LIMIT_PER_MINUTE=rate,
+                                       RATE_LIMIT_BURST=10 ** 9, RATE_LIMIT_DAILY_QUOTA=None):
+                    invalidate_api_keys()
+                    reset_limits()
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        for request in requests:
+                            assert middleware(request).status_code == 200
+                        elapsed = time.perf_counter() - start
+                self.stdout.write(f"{label:>9} {elapsed / len(requests) * 1e6:11.1f} {len(queries):>8}")
+            transaction.set_rollback(True)
+        invalidate_api_keys()
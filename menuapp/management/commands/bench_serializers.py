@@ -0,0 +1,76 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from menuapp.models import Category, Hotel, ManualCategory, MenuItem
+from menuapp.renderers import FastJSONRenderer, orjson
+from menuapp.serializers import MenuItemSerializer, serialize_menu_items
+
+
+class Command(BaseCommand):
+    help = "Compare MenuItemSerializer + JSONRenderer with the flat values() path + FastJSONRenderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", default="1000,10000", help="Comma-separated menu sizes")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per size; the best is reported")
+
+    def handle(self, *args, **opts):
+        sizes = [int(n) for n in opts["items"].split(",")]
+        request = RequestFactory().get("/api/hotel/1/menu/", HTTP_HOST="localhost")
+        self.stdout.write(f"orjson: {'yes' if orjson else 'no (stock json)'}")
+        self.stdout.write(f"{'items':>7} {'serializer(s)':>14} {'flat(s)':>9} {'speedup':>8} {'same':>5}")
+
+        for size in sizes:
+            with transaction.atomic():
+                items = self.build_menu(size)
+                serializer_time, slow = self.best(opts["repeat"], lambda: JSONRenderer().render(
+                    MenuItemSerializer(items.prefetch_related("categories", "manual_categories"), many=True,
+                                       context={"request": request}).data
+                ))
+                flat_time, fast = self.best(opts["repeat"], lambda: FastJSONRenderer().render(
+                    serialize_menu_items(items, request)
+                ))
+                transaction.set_rollback(True)
+
+            same = slow == fast
+            self.stdout.write(
+                f"{size:>7} {serializer_time:14.3f} {flat_time:9.3f} {serializer_time / flat_time:7.1f}x {str(same):>5}"
+            )
+
+    def best(self, repeat, func):
+        timings, result = [], None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    def build_menu(self, size):
+        """A hotel with `size` items, each with two categories, a manual category and image variants."""
+        hotel = Hotel.objects.create(name=f"Bench Hotel {size} {time.time_ns()}")
+        categories = [Category.objects.get_or_create(name=f"Bench {n}")[0] for n in range(10)]
+        manual, _ = ManualCategory.objects.get_or_create(name="Bench-07:00-11:00")
+        variants = {
+            "thumbnail": {"width": 200, "src": "images/ab/abc-thumbnail.jpg", "webp": "images/ab/abc-thumbnail.webp"},
+            "medium": {"width": 600, "src": "images/ab/abc-medium.jpg", "webp": "images/ab/abc-medium.webp"},
+        }
+        created = MenuItem.objects.bulk_create([
+            MenuItem(
+                hotel=hotel, item_name=f"Item {n}", normalized_name=f"item {n}", price=Decimal("1.250"), description="Bench item",
+                image_local="images/ab/abc.jpg" if n % 2 else "", image_url="" if n % 2 else "https://example.com/x.jpg",
+                image_variants=variants if n % 2 else {},
+            )
+            for n in range(size)
+        ], batch_size=1000)
+        MenuItem.categories.through.objects.bulk_create([
+            MenuItem.categories.through(menuitem_id=item.pk, category_id=categories[(item.pk + k) % 10].pk)
+            for item in created for k in (0, 1)
+        ], batch_size=1000)
+        MenuItem.manual_categories.through.objects.bulk_create([
+            MenuItem.manual_categories.through(menuitem_id=item.pk, manualcategory_id=manual.pk) for item in created
+        ], batch_size=1000)
+        return MenuItem.objects.filter(hotel=hotel).order_by("pk")
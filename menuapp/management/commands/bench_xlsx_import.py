@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from openpyxl import Workbook
+from PIL import Image
+
+from menuapp.importer import import_menu
+
+def _png_bytes():
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 120, 40)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+PNG_BYTES = _png_bytes()
+
+
+def start_image_server(latency):
+    """Start a local stand-in image host that answers every GET after `latency` seconds."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(PNG_BYTES)))
+            self.end_headers()
+            self.wfile.write(PNG_BYTES)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Command(BaseCommand):
+    help = "Benchmark XLSX menu import wall-clock time against local stand-in image hosts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", default="50,200,500", help="Comma-separated row counts")
+        parser.add_argument("--latency", default="0.05,0.2", help="Comma-separated per-image latencies (seconds)")
+        parser.add_argument("--hosts", type=int, default=4, help="Number of stand-in image hosts")
+        parser.add_argument("--workers", type=int, default=None, help="Global concurrency (default: settings)")
+        parser.add_argument("--per-host", type=int, default=None, help="Per-host concurrency (default: settings)")
+        parser.add_argument("--skip-serial", action="store_true", help="Don't run the one-at-a-time baseline")
+
+    def handle(self, *args, **opts):
+        row_counts = [int(r) for r in opts["rows"].split(",")]
+        latencies = [float(l) for l in opts["latency"].split(",")]
+
+        pool = {}
+        if opts["workers"]:
+            pool["IMAGE_FETCH_MAX_WORKERS"] = opts["workers"]
+        if opts["per_host"]:
+            pool["IMAGE_FETCH_PER_HOST"] = opts["per_host"]
+
+        self.stdout.write(f"{'rows':>6} {'latency':>8} {'serial(s)':>10} {'pooled(s)':>10} {'speedup':>8}")
+        for latency in latencies:
+            servers = [start_image_server(latency) for _ in range(opts["hosts"])]
+            try:
+                for rows in row_counts:
+                    work_dir = tempfile.mkdtemp(prefix="bench_import_")
+                    try:
+                        xlsx = self.build_workbook(work_dir, rows, servers)
+                        serial = None
+                        if not opts["skip_serial"]:
+                            serial = self.timed_import(xlsx, work_dir, IMAGE_FETCH_MAX_WORKERS=1, IMAGE_FETCH_PER_HOST=1)
+                        pooled = self.timed_import(xlsx, work_dir, **pool)
+                    finally:
+                        shutil.rmtree(work_dir, ignore_errors=True)
+
+                    serial_col = f"{serial:10.2f}" if serial is not None else f"{'-':>10}"
+                    speedup = f"{serial / pooled:7.1f}x" if serial is not None else f"{'-':>8}"
+                    self.stdout.write(f"{rows:>6} {latency:>8.3f} {serial_col} {pooled:10.2f} {speedup}")
+            finally:
+                for server in servers:
+                    server.shutdown()
+                    server.server_close()
+
+    def build_workbook(self, work_dir, rows, servers):
+        wb = Workbook()
+        sheet = wb.active
+        sheet.append(["name", "price", "category", "description", "image"])
+        for n in range(rows):
+            host, port = servers[n % len(servers)].server_address
+            sheet.append([f"Item {n}", 1.5, "Bench", "", f"http://{host}:{port}/img/{n}.png"])
+        path = os.path.join(work_dir, "menu_data_Bench Hotel.xlsx")
+        wb.save(path)
+        return path
+
+    def timed_import(self, xlsx, work_dir, **overrides):
+        """Run a full import inside a rolled-back transaction and return elapsed seconds."""
+        media_root = tempfile.mkdtemp(dir=work_dir)
+        with override_settings(MEDIA_ROOT=media_root, **overrides), transaction.atomic():
+            start = time.perf_counter()
+            import_menu(xlsx, "Bench Hotel")
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return elapsed
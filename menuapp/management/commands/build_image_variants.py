@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from menuapp.imaging import build_variants_many
+from menuapp.models import MenuItem
+from menuapp.signals import bump_menu_version
+
+
+class Command(BaseCommand):
+    help = "Backfill resized/WebP renditions for menu item images that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Re-render every image, even ones that already have variants")
+        parser.add_argument("--workers", type=int, default=None, help="Parallel render threads")
+        parser.add_argument("--batch-size", type=int, default=200, help="Distinct images rendered per batch")
+
+    def handle(self, *args, **opts):
+        items = MenuItem.objects.exclude(image_local="").exclude(image_local__isnull=True)
+        if not opts["force"]:
+            items = items.filter(image_variants={})
+
+        # Items share images by content hash: render each file once
+        names = list(items.order_by().values_list("image_local", flat=True).distinct())
+        self.stdout.write(f"{len(names)} images to render.")
+
+        start = time.perf_counter()
+        rendered = updated = 0
+        batch_size = opts["batch_size"]
+        for offset in range(0, len(names), batch_size):
+            batch = names[offset:offset + batch_size]
+            variants = build_variants_many(batch, max_workers=opts["workers"], force=opts["force"])
+            # Menus cache per hotel (ETags, response cache): bump the hotels whose items change
+            hotel_ids = set(MenuItem.objects.filter(image_local__in=batch).values_list("hotel_id", flat=True).distinct())
+            for name, sizes in variants.items():
+                if sizes:
+                    rendered += 1
+                updated += MenuItem.objects.filter(image_local=name).update(
+                    image_variants=sizes, updated_at=timezone.now()
+                )
+            bump_menu_version(hotel_ids)
+            self.stdout.write(f"  {min(offset + batch_size, len(names))}/{len(names)} images")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} images ({updated} items updated) in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,140 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from menuapp.models import Hotel, ImportJob, MenuItem
+from menuapp.storage import VARIANT_FORMATS, variant_name
+
+# Directories holding per-request scratch files rather than referenced media
+TEMP_DIRS = ("temp", "uploads")
+
+
+def scan_media(root, workers):
+    """
+    Every file under `root` as (relative path, size, mtime). Directories are
+    scanned in parallel, one os.scandir per task. Returns (files, dirs scanned).
+    """
+    files, dirs = [], 0
+
+    def scan(path):
+        found, subdirs = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        found.append((os.path.relpath(entry.path, root).replace(os.sep, "/"), stat.st_size, stat.st_mtime))
+        except OSError as e:
+            print(f"[Media Scan Error] {path} | Error: {e}")
+        return found, subdirs
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(scan, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found, subdirs = future.result()
+                dirs += 1
+                files.extend(found)
+                pending |= {pool.submit(scan, path) for path in subdirs}
+    return files, dirs
+
+
+def referenced_media():
+    """Names of every file the database points at: images, their renditions, logos and pending uploads."""
+    sizes = getattr(settings, "IMAGE_VARIANT_WIDTHS", {})
+    names = set()
+    for image, variants in MenuItem.objects.exclude(image_local="").exclude(image_local__isnull=True).values_list(
+        "image_local", "image_variants"
+    ).iterator(chunk_size=5000):
+        names.add(image)
+        for variant in (variants or {}).values():
+            names.update((variant.get("src"), variant.get("webp")))
+    names |= set(Hotel.objects.exclude(logo="").exclude(logo__isnull=True).values_list("logo", flat=True))
+
+    # Renditions a referenced image may have on disk whether or not they're recorded yet
+    names |= {variant_name(name, size, ext) for name in list(names) for size in sizes for ext in VARIANT_FORMATS}
+
+    names |= set(ImportJob.objects.filter(
+        status__in=[ImportJob.STATUS_QUEUED, ImportJob.STATUS_RUNNING]
+    ).values_list("file", flat=True))
+    names.discard(None)
+    return names
+
+
+class Command(BaseCommand):
+    help = "Find and remove media files nothing in the database references, and stale temp/upload files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+        parser.add_argument("--workers", type=int, default=8, help="Parallel directory scanners")
+        parser.add_argument("--grace-minutes", type=int, default=getattr(settings, "MEDIA_GRACE_MINUTES", 60),
+                            help="Leave files younger than this (an import may be about to reference them)")
+        parser.add_argument("--temp-hours", type=int, default=24,
+                            help="Age after which temp files and unclaimed uploads count as stale")
+
+    def handle(self, *args, **opts):
+        root = str(settings.MEDIA_ROOT)
+        if not os.path.isdir(root):
+            self.stdout.write(f"{root} does not exist, nothing to do.")
+            return
+
+        start = time.perf_counter()
+        # Read references before scanning: files written meanwhile are covered by the grace period
+        referenced = referenced_media()
+        scan_start = time.perf_counter()
+        files, dirs = scan_media(root, max(opts["workers"], 1))
+        scanned = time.perf_counter() - scan_start
+
+        now = time.time()
+        grace_cutoff = now - opts["grace_minutes"] * 60
+        temp_cutoff = now - opts["temp_hours"] * 3600
+        # Renditions of an image used within the grace period may be about to be referenced with it
+        young = {os.path.splitext(name)[0] for name, _, mtime in files if mtime >= grace_cutoff}
+        orphans, stale = [], []
+        for name, size, mtime in files:
+            # ContentAddressedStorage.store writes its .incoming- temp files in MEDIA_ROOT itself
+            temp = name.split("/", 1)[0] in TEMP_DIRS or os.path.basename(name).startswith(".incoming-")
+            if name in referenced or ("/" not in name and not temp):
+                # Other top-level files are site assets such as the no_image.jpg placeholder
+                continue
+            if temp and mtime < temp_cutoff:
+                stale.append((name, size))
+            elif not temp and mtime < grace_cutoff and name.rsplit("-", 1)[0] not in young:
+                orphans.append((name, size))
+
+        removed = failed = 0
+        for label, found in (("orphan", orphans), ("stale", stale)):
+            for name, size in found:
+                if opts["dry_run"] or opts["verbosity"] > 1:
+                    self.stdout.write(f"  {label}: {name} ({size} bytes)")
+                if opts["dry_run"]:
+                    continue
+                try:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+                except OSError as e:
+                    failed += 1
+                    print(f"[Media GC Error] {name} | Error: {e}")
+
+        elapsed = time.perf_counter() - start
+        total_bytes = sum(size for _, size, _ in files)
+        self.stdout.write(
+            f"Scanned {len(files)} files ({total_bytes / 1e6:.1f} MB) in {dirs} directories in {scanned:.2f}s "
+            f"({len(files) / scanned if scanned else 0:.0f} files/s); {len(referenced)} referenced names."
+        )
+        summary = (
+            f"{len(orphans)} orphans ({sum(s for _, s in orphans) / 1e6:.1f} MB), "
+            f"{len(stale)} stale temp/upload files ({sum(s for _, s in stale) / 1e6:.1f} MB)"
+        )
+        if opts["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Dry run: would remove {summary}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Removed {removed} files: {summary}; {failed} failed. Total {elapsed:.2f}s."
+            ))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from menuapp.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Delete sync tombstones older than SYNC_TOMBSTONE_DAYS (clients that far behind get a full reset anyway)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Override SYNC_TOMBSTONE_DAYS")
+
+    def handle(self, *args, **opts):
+        days = opts["days"] or getattr(settings, "SYNC_TOMBSTONE_DAYS", 90)
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} tombstones older than {days} days."))
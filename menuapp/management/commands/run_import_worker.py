@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from menuapp.importer import claim_next_job, process_job
+
+
+class Command(BaseCommand):
+    help = "Process queued XLSX menu imports (run under systemd/supervisor next to gunicorn)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit instead of polling")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **opts):
+        self.stdout.write("Import worker started.")
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if opts["once"]:
+                    break
+                time.sleep(opts["interval"])
+                continue
+
+            self.stdout.write(f"Processing import #{job.pk} ({job.hotel_name})...")
+            job = process_job(job)
+            if job.status == job.STATUS_DONE:
+                summary = job.summary
+                self.stdout.write(self.style.SUCCESS(
+                    f"Import #{job.pk} ({job.mode}): {job.items_imported} rows imported, "
+                    f"{summary.get('created', 0)} created, {summary.get('updated', 0)} updated, "
+                    f"{summary.get('unchanged', 0)} unchanged, {summary.get('deleted', 0)} deleted, "
+                    f"{len(job.skipped)} skipped rows."
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f"Import #{job.pk} failed: {job.error}"))
@@ -1,12 +1,18 @@
-from django.conf import settings
 from django.http import JsonResponse
-from .models import AllowedApp
+from .api_keys import find_app
+from .ratelimit import check_request
 
 
 
 
 class APIKeyMiddleware:
-    """Simple middleware to check X-APP-KEY header for API requests starting with /api/"""
+    """
+    Simple middleware to check X-APP-KEY header for API requests starting with /api/.
+    Keys are checked against a cache of active apps (menuapp.api_keys), not a
+    query per request; the matching app is available as request.allowed_app.
+    Each app's rate limit and daily quota (menuapp.ratelimit) are enforced
+    here too, with 429 + Retry-After once exceeded.
+    """
 
 
     def __init__(self, get_response):
@@ -18,9 +24,16 @@ class APIKeyMiddleware:
             api_key = request.META.get('HTTP_X_APP_KEY') or request.GET.get('api_key')
             if not api_key:
                 return JsonResponse({'detail': 'API key missing'}, status=401)
-            try:
-                app = AllowedApp.objects.get(api_key=api_key, is_active=True)
-            except AllowedApp.DoesNotExist:
+            app = find_app(api_key)
+            if app is None:
                 return JsonResponse({'detail': 'Invalid API key'}, status=403)
-            response = self.get_response(request)
-        return response
\ No newline at end of file
+            allowed, headers = check_request(app)
+            if not allowed:
+                response = JsonResponse({'detail': 'Rate limit exceeded'}, status=429)
+            else:
+                request.allowed_app = app
+                response = self.get_response(request)
+            for name, value in headers.items():
+                response[name] = value
+            return response
+        return self.get_response(request)
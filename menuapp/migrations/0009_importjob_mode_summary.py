@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuapp', '0008_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('sync', 'Update existing menu'), ('replace', 'Replace whole menu')], default='sync', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='summary',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:40
+
+import menuapp.models
+import menuapp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuapp', '0009_importjob_mode_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hotel',
+            name='logo',
+            field=models.ImageField(blank=True, null=True, storage=menuapp.storage.ContentAddressedStorage(), upload_to='hotel_logos/'),
+        ),
+        migrations.AlterField(
+            model_name='menuitem',
+            name='image_local',
+            field=models.ImageField(blank=True, null=True, storage=menuapp.storage.ContentAddressedStorage(), upload_to=menuapp.models.MenuItem.hotel_image_upload_path),
+        ),
+    ]
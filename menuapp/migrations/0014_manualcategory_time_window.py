@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:46
+
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def parse_time_window(name):
+    # Frozen copy of menuapp.models.parse_time_window as of this migration
+    parts = str(name).split('-')
+    if len(parts) < 3:
+        return None, None
+    try:
+        start = datetime.strptime(parts[-2].strip(), "%H:%M").time()
+        end = datetime.strptime(parts[-1].strip(), "%H:%M").time()
+    except ValueError:
+        return None, None
+    return start, end
+
+
+def fill_time_windows(apps, schema_editor):
+    ManualCategory = apps.get_model('menuapp', 'ManualCategory')
+    categories = list(ManualCategory.objects.all())
+    for category in categories:
+        category.start_time, category.end_time = parse_time_window(category.name)
+    ManualCategory.objects.bulk_update(categories, ['start_time', 'end_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuapp', '0013_menuversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manualcategory',
+            name='end_time',
+            field=models.TimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='manualcategory',
+            name='start_time',
+            field=models.TimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_time_windows, migrations.RunPython.noop),
+    ]
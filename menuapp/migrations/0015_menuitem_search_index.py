@@ -0,0 +1,109 @@
+from django.db import migrations
+
+# FTS5 index over menu item names, descriptions and category names
+# (menuapp.search). rowid = menuapp_menuitem.id. Kept in sync by triggers, so
+# bulk_create/bulk_update and queryset.update() writes are covered too.
+
+CATEGORY_NAMES = """
+    trim(
+        coalesce((SELECT group_concat(c.name, ' ') FROM menuapp_category c
+                  JOIN menuapp_menuitem_categories mc ON mc.category_id = c.id
+                  WHERE mc.menuitem_id = {item}), '')
+        || ' ' ||
+        coalesce((SELECT group_concat(m.name, ' ') FROM menuapp_manualcategory m
+                  JOIN menuapp_menuitem_manual_categories mm ON mm.manualcategory_id = m.id
+                  WHERE mm.menuitem_id = {item}), '')
+    )
+"""
+
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE menuapp_menuitem_fts USING fts5(
+        item_name, description, categories,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER menuapp_menuitem_fts_insert AFTER INSERT ON menuapp_menuitem BEGIN
+        INSERT INTO menuapp_menuitem_fts(rowid, item_name, description, categories)
+        VALUES (new.id, new.item_name, coalesce(new.description, ''), {CATEGORY_NAMES.format(item='new.id')});
+    END
+    """,
+    """
+    CREATE TRIGGER menuapp_menuitem_fts_update AFTER UPDATE OF item_name, description ON menuapp_menuitem BEGIN
+        UPDATE menuapp_menuitem_fts SET item_name = new.item_name, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER menuapp_menuitem_fts_delete AFTER DELETE ON menuapp_menuitem BEGIN
+        DELETE FROM menuapp_menuitem_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+# Category links and renames refresh the categories column of the affected items
+for table, ref, column in (
+    ("menuapp_menuitem_categories", "menuapp_category", "category_id"),
+    ("menuapp_menuitem_manual_categories", "menuapp_manualcategory", "manualcategory_id"),
+):
+    FORWARD += [
+        f"""
+        CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='new.menuitem_id')}
+            WHERE rowid = new.menuitem_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='old.menuitem_id')}
+            WHERE rowid = old.menuitem_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER {ref}_fts_rename AFTER UPDATE OF name ON {ref} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='menuapp_menuitem_fts.rowid')}
+            WHERE rowid IN (SELECT menuitem_id FROM {table} WHERE {column} = new.id);
+        END
+        """,
+    ]
+
+FORWARD.append(f"""
+    INSERT INTO menuapp_menuitem_fts(rowid, item_name, description, categories)
+    SELECT id, item_name, coalesce(description, ''), {CATEGORY_NAMES.format(item='menuapp_menuitem.id')}
+    FROM menuapp_menuitem
+""")
+
+BACKWARD = [
+    "DROP TRIGGER IF EXISTS menuapp_category_fts_rename",
+    "DROP TRIGGER IF EXISTS menuapp_manualcategory_fts_rename",
+    "DROP TRIGGER IF EXISTS menuapp_menuitem_manual_categories_fts_delete",
+    "DROP TRIGGER IF EXISTS menuapp_menuitem_manual_categories_fts_insert",
+    "DROP TRIGGER IF EXISTS menuapp_menuitem_categories_fts_delete",
+    "DROP TRIGGER IF EXISTS menuapp_menuitem_categories_fts_insert",
+    "DROP TRIGGER IF EXISTS menuapp_menuitem_fts_delete",
+    "DROP TRIGGER IF EXISTS menuapp_menuitem_fts_update",
+    "DROP TRIGGER IF EXISTS menuapp_menuitem_fts_insert",
+    "DROP TABLE IF EXISTS menuapp_menuitem_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuapp', '0014_manualcategory_time_window'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(FORWARD), _run(BACKWARD)),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Frozen copies of what this migration needs; later changes to menuapp.models
+# or menuapp.search must not change what it does.
+
+CATEGORY_NAMES = """
+    trim(
+        coalesce((SELECT group_concat(c.name, ' ') FROM menuapp_category c
+                  JOIN menuapp_menuitem_categories mc ON mc.category_id = c.id
+                  WHERE mc.menuitem_id = {item}), '')
+        || ' ' ||
+        coalesce((SELECT group_concat(m.name, ' ') FROM menuapp_manualcategory m
+                  JOIN menuapp_menuitem_manual_categories mm ON mm.manualcategory_id = m.id
+                  WHERE mm.menuitem_id = {item}), '')
+    )
+"""
+
+# The menu item triggers of 0015, which the table rebuild below drops
+MENUITEM_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_insert AFTER INSERT ON menuapp_menuitem BEGIN
+        INSERT INTO menuapp_menuitem_fts(rowid, item_name, description, categories)
+        VALUES (new.id, new.item_name, coalesce(new.description, ''), {CATEGORY_NAMES.format(item='new.id')});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_update AFTER UPDATE OF item_name, description ON menuapp_menuitem BEGIN
+        UPDATE menuapp_menuitem_fts SET item_name = new.item_name, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_delete AFTER DELETE ON menuapp_menuitem BEGIN
+        DELETE FROM menuapp_menuitem_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+
+def normalize_name(name):
+    decomposed = unicodedata.normalize("NFKD", " ".join(str(name).split()).casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def fill_normalized_names(apps, schema_editor):
+    MenuItem = apps.get_model('menuapp', 'MenuItem')
+    batch = []
+    for item in MenuItem.objects.only('pk', 'item_name').iterator(chunk_size=2000):
+        item.normalized_name = normalize_name(item.item_name)
+        batch.append(item)
+        if len(batch) >= 2000:
+            MenuItem.objects.bulk_update(batch, ['normalized_name'])
+            batch = []
+    MenuItem.objects.bulk_update(batch, ['normalized_name'])
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding the column rebuilt menuapp_menuitem on SQLite, dropping its triggers
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in MENUITEM_TRIGGERS:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuapp', '0015_menuitem_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['hotel', 'normalized_name'], name='menuapp_men_hotel_i_aa8c73_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['normalized_name'], name='menuapp_men_normali_ac111b_idx'),
+        ),
+        migrations.RunPython(fill_normalized_names, migrations.RunPython.noop),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Frozen copy of the FTS triggers as 0015/0016 left them
+CATEGORY_NAMES = """
+    trim(
+        coalesce((SELECT group_concat(c.name, ' ') FROM menuapp_category c
+                  JOIN menuapp_menuitem_categories mc ON mc.category_id = c.id
+                  WHERE mc.menuitem_id = {item}), '')
+        || ' ' ||
+        coalesce((SELECT group_concat(m.name, ' ') FROM menuapp_manualcategory m
+                  JOIN menuapp_menuitem_manual_categories mm ON mm.manualcategory_id = m.id
+                  WHERE mm.menuitem_id = {item}), '')
+    )
+"""
+
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_insert AFTER INSERT ON menuapp_menuitem BEGIN
+        INSERT INTO menuapp_menuitem_fts(rowid, item_name, description, categories)
+        VALUES (new.id, new.item_name, coalesce(new.description, ''), {CATEGORY_NAMES.format(item='new.id')});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_update AFTER UPDATE OF item_name, description ON menuapp_menuitem BEGIN
+        UPDATE menuapp_menuitem_fts SET item_name = new.item_name, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_delete AFTER DELETE ON menuapp_menuitem BEGIN
+        DELETE FROM menuapp_menuitem_fts WHERE rowid = old.id;
+    END
+    """,
+]
+for table, ref, column in (
+    ("menuapp_menuitem_categories", "menuapp_category", "category_id"),
+    ("menuapp_menuitem_manual_categories", "menuapp_manualcategory", "manualcategory_id"),
+):
+    TRIGGERS += [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='new.menuitem_id')}
+            WHERE rowid = new.menuitem_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='old.menuitem_id')}
+            WHERE rowid = old.menuitem_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {ref}_fts_rename AFTER UPDATE OF name ON {ref} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='menuapp_menuitem_fts.rowid')}
+            WHERE rowid IN (SELECT menuitem_id FROM {table} WHERE {column} = new.id);
+        END
+        """,
+    ]
+
+TRIGGER_NAMES = [
+    "menuapp_menuitem_fts_insert", "menuapp_menuitem_fts_update", "menuapp_menuitem_fts_delete",
+    "menuapp_menuitem_categories_fts_insert", "menuapp_menuitem_categories_fts_delete", "menuapp_category_fts_rename",
+    "menuapp_menuitem_manual_categories_fts_insert", "menuapp_menuitem_manual_categories_fts_delete",
+    "menuapp_manualcategory_fts_rename",
+]
+
+
+def drop_triggers(apps, schema_editor):
+    # The category tables are rebuilt below and the FTS triggers reference them
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGER_NAMES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in TRIGGERS:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuapp', '0016_menuitem_normalized_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_triggers, restore_search_triggers),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('hotel', 'Hotel'), ('item', 'Menu item'), ('category', 'Category'), ('manual_category', 'Manual category')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('hotel_id', models.BigIntegerField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='hotel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='manualcategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(restore_search_triggers, drop_triggers),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuapp', '0018_menuitem_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='allowedapp',
+            name='burst',
+            field=models.PositiveIntegerField(blank=True, help_text='Requests allowed back to back', null=True),
+        ),
+        migrations.AddField(
+            model_name='allowedapp',
+            name='daily_quota',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='allowedapp',
+            name='rate_per_minute',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
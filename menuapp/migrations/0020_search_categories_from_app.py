@@ -0,0 +1,81 @@
+from django.db import migrations
+
+# The categories column of the search index is maintained by app code from
+# here on (menuapp.search.refresh_search_categories). Triggers that name
+# menuapp_category/menuapp_manualcategory are dropped: SQLite's table rebuild
+# for an AddField/AlterField on those models fails while they exist.
+# SQL is frozen here; later changes to menuapp.search must not change it.
+
+CATEGORY_NAMES = """
+    trim(
+        coalesce((SELECT group_concat(c.name, ' ') FROM menuapp_category c
+                  JOIN menuapp_menuitem_categories mc ON mc.category_id = c.id
+                  WHERE mc.menuitem_id = {item}), '')
+        || ' ' ||
+        coalesce((SELECT group_concat(m.name, ' ') FROM menuapp_manualcategory m
+                  JOIN menuapp_menuitem_manual_categories mm ON mm.manualcategory_id = m.id
+                  WHERE mm.menuitem_id = {item}), '')
+    )
+"""
+
+INSERT_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_insert AFTER INSERT ON menuapp_menuitem BEGIN
+        INSERT INTO menuapp_menuitem_fts(rowid, item_name, description, categories)
+        VALUES (new.id, new.item_name, coalesce(new.description, ''), {categories});
+    END
+"""
+
+CATEGORY_TRIGGERS = []
+for table, ref, column in (
+    ("menuapp_menuitem_categories", "menuapp_category", "category_id"),
+    ("menuapp_menuitem_manual_categories", "menuapp_manualcategory", "manualcategory_id"),
+):
+    CATEGORY_TRIGGERS += [
+        (f"{table}_fts_insert", f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='new.menuitem_id')}
+            WHERE rowid = new.menuitem_id;
+        END
+        """),
+        (f"{table}_fts_delete", f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='old.menuitem_id')}
+            WHERE rowid = old.menuitem_id;
+        END
+        """),
+        (f"{ref}_fts_rename", f"""
+        CREATE TRIGGER IF NOT EXISTS {ref}_fts_rename AFTER UPDATE OF name ON {ref} BEGIN
+            UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='menuapp_menuitem_fts.rowid')}
+            WHERE rowid IN (SELECT menuitem_id FROM {table} WHERE {column} = new.id);
+        END
+        """),
+    ]
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, _ in CATEGORY_TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    schema_editor.execute("DROP TRIGGER IF EXISTS menuapp_menuitem_fts_insert")
+    schema_editor.execute(INSERT_TRIGGER.format(categories="''"))
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TRIGGER IF EXISTS menuapp_menuitem_fts_insert")
+    schema_editor.execute(INSERT_TRIGGER.format(categories=CATEGORY_NAMES.format(item='new.id')))
+    for _, sql in CATEGORY_TRIGGERS:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuapp', '0019_allowedapp_limits'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
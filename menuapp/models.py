@@ -1,12 +1,29 @@
+import unicodedata
+from datetime import datetime
+
+from django.conf import settings
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 import uuid
 from slugify import slugify
 
+from .storage import content_store
+
+def normalize_name(name) -> str:
+    """
+    Key used to match menu items across imports and group them across hotels:
+    trimmed, single-spaced, case-folded, with diacritics removed ("Café " == "cafe").
+    """
+    decomposed = unicodedata.normalize("NFKD", " ".join(str(name).split()).casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
 class Hotel(models.Model):
     name = models.CharField(max_length=255, unique=True)
-    logo = models.ImageField(upload_to='hotel_logos/', null=True, blank=True)
+    logo = models.ImageField(upload_to='hotel_logos/', storage=content_store, null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # read by /api/sync/
 
     def __str__(self):
         return self.name
@@ -16,6 +33,7 @@ class Category(models.Model):
     """Separate model to hold all unique categories."""
     name = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # read by /api/sync/
 
     class Meta:
         ordering = ['name']
@@ -27,19 +45,24 @@ class Category(models.Model):
 class MenuItem(models.Model):
     hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='menu_items')
     item_name = models.CharField(max_length=255)
+    # normalize_name(item_name): the key items are matched and grouped by across imports and hotels
+    normalized_name = models.CharField(max_length=255, default='', editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=3, null=True, blank=True)
     categories = models.ManyToManyField('Category', blank=True, related_name='menu_items')
     manual_categories = models.ManyToManyField('ManualCategory', blank=True, related_name='menu_items')  # ✅ separate table
     description = models.TextField(null=True, blank=True)
     image_url = models.URLField(null=True, blank=True)
     def hotel_image_upload_path(instance, filename):
-        """Upload path: media/menu_images/<hotel-name>/<filename>"""
-        
+        """Upload path: media/menu_images/<hotel-name>/<filename>
+        (content_store then files it under its content hash; only the extension is kept)"""
+
         hotel_folder = slugify(instance.hotel.name)
         return f"menu_images/{hotel_folder}/{filename}"
-    image_local = models.ImageField(upload_to=hotel_image_upload_path, null=True, blank=True)
+    image_local = models.ImageField(upload_to=hotel_image_upload_path, storage=content_store, null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)  # {"thumbnail": {"width": 200, "src": .., "webp": ..}, ...}
     is_visible = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # read by /api/sync/
     
     
 
@@ -47,14 +70,44 @@ class MenuItem(models.Model):
         unique_together = ('hotel', 'item_name')
         indexes = [
             models.Index(fields=['hotel', 'item_name']),
+            models.Index(fields=['hotel', 'normalized_name']),
+            models.Index(fields=['normalized_name']),
+            models.Index(fields=['item_name', 'id']),  # keyset paging in /api/menu/items/
         ]
 
     def __str__(self):
         return f"{self.hotel.name} - {self.item_name}"
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.item_name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'item_name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
     
+def parse_time_window(name):
+    """
+    (start, end) times from a category name ending in "-HH:MM-HH:MM",
+    e.g. "Breakfast-07:00-11:00"; (None, None) when it has no valid window.
+    """
+    parts = str(name).split('-')
+    if len(parts) < 3:
+        return None, None
+    try:
+        start = datetime.strptime(parts[-2].strip(), "%H:%M").time()
+        end = datetime.strptime(parts[-1].strip(), "%H:%M").time()
+    except ValueError:
+        return None, None
+    return start, end
+
+
 class ManualCategory(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    # Time window parsed from the name (see menuapp.schedule); null = never time-active
+    start_time = models.TimeField(null=True, blank=True, db_index=True, editable=False)
+    end_time = models.TimeField(null=True, blank=True, db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # read by /api/sync/
 
     class Meta:
         ordering = ['name']
@@ -62,10 +115,46 @@ class ManualCategory(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.start_time, self.end_time = parse_time_window(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'start_time', 'end_time'}
+        super().save(*args, **kwargs)
+
+class Tombstone(models.Model):
+    """
+    A deleted hotel, menu item or category, kept for SYNC_TOMBSTONE_DAYS so
+    /api/sync/ can tell clients to drop it (see menuapp.sync).
+    """
+    KIND_HOTEL = 'hotel'
+    KIND_ITEM = 'item'
+    KIND_CATEGORY = 'category'
+    KIND_MANUAL_CATEGORY = 'manual_category'
+    KIND_CHOICES = [
+        (KIND_HOTEL, 'Hotel'),
+        (KIND_ITEM, 'Menu item'),
+        (KIND_CATEGORY, 'Category'),
+        (KIND_MANUAL_CATEGORY, 'Manual category'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    hotel_id = models.BigIntegerField(null=True, blank=True)  # menu items only, for per-hotel sync
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
 class AllowedApp(models.Model):
     app_name = models.CharField(max_length=255)
     api_key = models.CharField(max_length=64, unique=True)
     is_active = models.BooleanField(default=True)
+    # Request limits (menuapp.ratelimit); empty = the RATE_LIMIT_* defaults, 0 = unlimited
+    rate_per_minute = models.PositiveIntegerField(null=True, blank=True)
+    burst = models.PositiveIntegerField(null=True, blank=True, help_text="Requests allowed back to back")
+    daily_quota = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
@@ -75,3 +164,111 @@ class AllowedApp(models.Model):
 
     def __str__(self):
         return f"{self.app_name} ({'active' if self.is_active else 'inactive'})"
+
+
+class ImportJob(models.Model):
+    """A queued XLSX menu upload, processed off the request path by `run_import_worker`."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    MODE_SYNC = 'sync'
+    MODE_REPLACE = 'replace'
+    MODE_CHOICES = [
+        (MODE_SYNC, 'Update existing menu'),
+        (MODE_REPLACE, 'Replace whole menu'),
+    ]
+
+    hotel_name = models.CharField(max_length=255)
+    file = models.FileField(upload_to='uploads/')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    mode = models.CharField(max_length=16, choices=MODE_CHOICES, default=MODE_SYNC)
+    rows_parsed = models.PositiveIntegerField(default=0)
+    images_total = models.PositiveIntegerField(default=0)
+    images_fetched = models.PositiveIntegerField(default=0)
+    items_imported = models.PositiveIntegerField(default=0)
+    skipped = models.JSONField(default=list, blank=True)  # [{"row": 5, "reason": "No name"}, ...]
+    summary = models.JSONField(default=dict, blank=True)  # {"created": .., "updated": .., "unchanged": .., "deleted": ..}
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # last progress write of the worker running it
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import #{self.pk} {self.hotel_name} ({self.status})"
+
+
+class ImageFetch(models.Model):
+    """
+    What we last got for a remote image URL: validators for conditional
+    re-requests, the stored file, and a negative-cache window after failures.
+    """
+    url_hash = models.CharField(max_length=64, unique=True)  # sha256 of url; URLs can exceed index limits
+    url = models.TextField()
+    local_path = models.CharField(max_length=255, blank=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)  # raw Last-Modified header
+    failed_until = models.DateTimeField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.url
+
+
+class MenuVersion(models.Model):
+    """
+    Change stamp for menu data. Bumped (via menuapp.signals) whenever hotels,
+    menu items, visibility or categories change, so precomputed read models
+    and HTTP validators (ETag / Last-Modified) know when data changed.
+
+    Keys: "global" (any change), "hotel:<id>" (that hotel or its items) and
+    "categories" (Category / ManualCategory rows or their links from the
+    category side, which can touch any hotel).
+    """
+    GLOBAL = 'global'
+    CATEGORIES = 'categories'
+
+    key = models.CharField(max_length=64, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+    @classmethod
+    def current(cls, key=GLOBAL):
+        version, _ = cls.objects.get_or_create(key=key)
+        return version
+
+    @staticmethod
+    def hotel_key(hotel_id):
+        return f"hotel:{hotel_id}"
+
+    @classmethod
+    def stamps(cls, keys) -> dict:
+        """{key: MenuVersion} in one query; keys never bumped get an unsaved version 0 with no updated_at."""
+        found = {v.key: v for v in cls.objects.filter(key__in=keys)}
+        return {key: found.get(key) or cls(key=key, version=0, updated_at=None) for key in keys}
+
+    @classmethod
+    def bump(cls, keys):
+        keys = set(keys)
+        now = timezone.now()
+        cls.objects.filter(key__in=keys).update(version=F('version') + 1, updated_at=now)
+        existing = set(cls.objects.filter(key__in=keys).values_list('key', flat=True))
+        cls.objects.bulk_create(
+            [cls(key=key, version=1, updated_at=now) for key in keys - existing],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,118 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+# Per-process counters, used unless RATE_LIMIT_CACHE_ALIAS names a shared cache
+_lock = threading.Lock()
+_arrivals = {}  # app id -> theoretical arrival time (GCRA state of its token bucket)
+_daily = {}  # (app id, date) -> requests counted that day
+
+
+def _shared_cache():
+    alias = getattr(settings, "RATE_LIMIT_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def limits_for(app):
+    """(requests per minute, burst, daily quota) of an AppKey; None = unlimited."""
+    rate = app.rate_per_minute if app.rate_per_minute is not None else getattr(settings, "RATE_LIMIT_PER_MINUTE", 120)
+    burst = app.burst if app.burst is not None else getattr(settings, "RATE_LIMIT_BURST", 30)
+    quota = app.daily_quota if app.daily_quota is not None else getattr(settings, "RATE_LIMIT_DAILY_QUOTA", None)
+    return rate or None, max(burst or 1, 1), quota or None
+
+
+def _take_token(app_id, rate, burst, now):
+    """
+    Token bucket of `burst` tokens refilled at `rate` per minute, kept as a
+    single timestamp (GCRA): the time the bucket would be full again.
+    Returns (allowed, tokens left, seconds until a token is back, seconds until full).
+    """
+    interval = 60.0 / rate
+    shared = _shared_cache()
+    key = f"ratelimit:bucket:{app_id}"
+    with _lock:
+        # With a shared cache this read-modify-write isn't atomic across workers:
+        # concurrent requests can slip a token or two past the limit
+        stored = shared.get(key) if shared else _arrivals.get(app_id)
+        arrival = max(stored or now, now)
+        allow_at = arrival + interval - burst * interval
+        if now < allow_at:
+            return False, 0, allow_at - now, arrival - now
+        arrival += interval
+        if shared:
+            shared.set(key, arrival, timeout=math.ceil(arrival - now) + 1)
+        else:
+            _arrivals[app_id] = arrival
+    left = int((now - (arrival - burst * interval)) / interval)
+    return True, min(left, burst - 1), 0.0, arrival - now
+
+
+def _count_today(app_id, quota):
+    """Count a request against today's quota; returns (allowed, used today, seconds to midnight)."""
+    today = timezone.localdate()
+    midnight = timezone.make_aware(datetime.combine(today + timedelta(days=1), datetime.min.time()))
+    until_reset = max((midnight - timezone.now()).total_seconds(), 1)
+
+    shared = _shared_cache()
+    if shared:
+        key = f"ratelimit:day:{app_id}:{today.isoformat()}"
+        shared.add(key, 0, timeout=math.ceil(until_reset) + 60)
+        try:
+            used = shared.incr(key)
+        except ValueError:
+            shared.set(key, 1, timeout=math.ceil(until_reset) + 60)
+            used = 1
+    else:
+        with _lock:
+            if len(_daily) > 10000:
+                # Drop other days' counters
+                for old in [k for k in _daily if k[1] != today]:
+                    del _daily[old]
+            used = _daily[(app_id, today)] = _daily.get((app_id, today), 0) + 1
+    return used <= quota, used, until_reset
+
+
+def check_request(app):
+    """
+    Count one request by `app` (an AppKey). Returns (allowed, headers):
+    X-RateLimit-* headers describe the token bucket, X-Quota-* the daily
+    quota, and a refused request gets Retry-After.
+    """
+    rate, burst, quota = limits_for(app)
+    headers = {}
+
+    if rate:
+        allowed, left, wait, until_full = _take_token(app.id, rate, burst, time.time())
+        headers.update({
+            "X-RateLimit-Limit": str(rate),
+            "X-RateLimit-Burst": str(burst),
+            "X-RateLimit-Remaining": str(left),
+            "X-RateLimit-Reset": str(math.ceil(until_full)),
+        })
+        if not allowed:
+            headers["Retry-After"] = str(max(math.ceil(wait), 1))
+            return False, headers
+
+    if quota:
+        allowed, used, until_reset = _count_today(app.id, quota)
+        headers.update({
+            "X-Quota-Limit": str(quota),
+            "X-Quota-Remaining": str(max(quota - used, 0)),
+            "X-Quota-Reset": str(math.ceil(until_reset)),
+        })
+        if not allowed:
+            headers["Retry-After"] = str(math.ceil(until_reset))
+            return False, headers
+    return True, headers
+
+
+def reset_limits():
+    """Forget this process's counters (tests, benchmarks)."""
+    with _lock:
+        _arrivals.clear()
+        _daily.clear()
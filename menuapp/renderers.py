@@ -0,0 +1,29 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # listed in requirements.txt; without it the stock renderer is used
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed. Output matches
+    DRF's compact JSON: types orjson doesn't handle the same way (datetimes,
+    Decimals, lazy strings, ...) go through DRF's JSONEncoder, non-string
+    dict keys become strings, and U+2028/U+2029 are escaped. One difference:
+    NaN and infinite floats come out as null where DRF refuses them. Indented
+    output, and everything when orjson is missing, uses the stock renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(
+            data, default=JSONEncoder().default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+        # Valid JSON but not valid JavaScript; DRF escapes them too
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .conditional import MenuVersionConditionalMixin
+
+STATS_KEYS = {"hits": "menu:stats:hits", "misses": "menu:stats:misses"}
+
+
+def menu_cache():
+    return caches[getattr(settings, "MENU_CACHE_ALIAS", "default")]
+
+
+def _count(name):
+    cache = menu_cache()
+    key = STATS_KEYS[name]
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def cache_stats() -> dict:
+    """{"hits": n, "misses": n} for cached menu responses since the last reset."""
+    values = menu_cache().get_many(STATS_KEYS.values())
+    return {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+def reset_cache_stats():
+    menu_cache().delete_many(STATS_KEYS.values())
+
+
+class CachedMenuResponseMixin(MenuVersionConditionalMixin):
+    """
+    Cache the serialized body of public read APIs in the MENU_CACHE_ALIAS
+    cache. Keys combine the view, scheme, host and the request's ETag, which
+    already covers the URL (endpoint + params) and the MenuVersion stamps the
+    view depends on. Saves, deletes and M2M changes on menu models bump those
+    stamps (menuapp.signals), so exactly the affected entries stop matching
+    and age out. Responses are marked X-Cache: HIT / MISS.
+    """
+
+    def menu_cache_key(self, request):
+        # Bodies hold absolute URLs built from the request: scheme and host are part of the key
+        return f"menu:{type(self).__name__}:{request.scheme}:{request.get_host()}:{self.menu_etag}"
+
+    def menu_response(self, request, *args, **kwargs):
+        cache = menu_cache()
+        key = self.menu_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _count("hits")
+            return Response(data, headers={"X-Cache": "HIT"})
+
+        _count("misses")
+        response = super().menu_response(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,59 @@
+import random
+import threading
+from array import array
+from collections import OrderedDict
+
+from .models import MenuItem, MenuVersion
+
+# Id indexes kept per process: one per (menu version, hotel filter, category filter)
+MAX_INDEXES = 32
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def visible_ids(version, hotel_id=None, category_id=None) -> array:
+    """
+    Ids of the visible menu items matching the filters, as a compact array.
+    Loaded with one id-only query per menu version and filter combination.
+    """
+    key = (version, hotel_id, category_id)
+    with _lock:
+        ids = _indexes.get(key)
+        if ids is not None:
+            _indexes.move_to_end(key)
+            return ids
+
+    items = MenuItem.objects.filter(is_visible=True)
+    if hotel_id is not None:
+        items = items.filter(hotel_id=hotel_id)
+    if category_id is not None:
+        items = items.filter(categories__id=category_id).distinct()
+    ids = array("q", items.order_by("pk").values_list("pk", flat=True))
+
+    with _lock:
+        for old in [k for k in _indexes if k[0] < version]:
+            del _indexes[old]
+        _indexes[key] = ids
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return ids
+
+
+def sample_items(count: int, hotel_id=None, category_id=None) -> list:
+    """
+    Up to `count` distinct random visible MenuItems. Ids are drawn from the
+    cached index, and only the chosen rows are read from the DB.
+    """
+    ids = visible_ids(MenuVersion.current().version, hotel_id, category_id)
+    chosen = random.sample(ids, min(count, len(ids)))
+    if not chosen:
+        return []
+    items = (
+        MenuItem.objects.filter(pk__in=chosen)
+        .select_related("hotel")
+        .prefetch_related("categories", "manual_categories")
+        .in_bulk()
+    )
+    # Rows deleted since the index was built are simply left out
+    return [items[pk] for pk in chosen if pk in items]
@@ -0,0 +1,81 @@
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+from .models import ManualCategory
+
+# Last computed schedule; valid while the menu version is unchanged and the clock is in [valid_from, valid_until)
+_schedule = {"version": None, "windows": (), "active": frozenset(), "since": None, "valid_from": None, "valid_until": None}
+_lock = threading.Lock()
+
+
+def menu_now() -> datetime:
+    """Current time in the menu's local time zone (MENU_TIME_ZONE)."""
+    return datetime.now(ZoneInfo(getattr(settings, "MENU_TIME_ZONE", "Asia/Kuwait")))
+
+
+def in_window(start, end, moment) -> bool:
+    if start <= end:
+        return start <= moment <= end
+    # Cross-midnight (e.g., 22:00–02:00)
+    return moment >= start or moment <= end
+
+
+def _boundaries(windows, now):
+    for _, start, end in windows:
+        yield datetime.combine(now.date(), start, now.tzinfo)
+        # Windows include their end minute, so they close just after it
+        yield datetime.combine(now.date(), end, now.tzinfo) + timedelta(microseconds=1)
+
+
+def next_boundary(windows, now):
+    """Earliest moment after `now` at which any window opens or closes."""
+    return min((at if at > now else at + timedelta(days=1) for at in _boundaries(windows, now)), default=None)
+
+
+def previous_boundary(windows, now):
+    """Latest moment at or before `now` at which any window opened or closed."""
+    return max((at if at <= now else at - timedelta(days=1) for at in _boundaries(windows, now)), default=None)
+
+
+def active_categories(version, now=None) -> frozenset:
+    """Ids of the manual categories whose time window contains `now` (see active_window)."""
+    return active_window(version, now)[0]
+
+
+def active_window(version, now=None):
+    """
+    (ids of the manual categories whose time window contains `now`,
+    moment the set last changed by the clock or None).
+
+    Windows are read from the DB once per menu version (category edits bump
+    it); the active set is then reused until the next window boundary, so a
+    request normally costs a couple of comparisons.
+    """
+    now = now or menu_now()
+    with _lock:
+        if (
+            _schedule["version"] == version
+            and _schedule["valid_from"] <= now
+            and (_schedule["valid_until"] is None or now < _schedule["valid_until"])
+        ):
+            return _schedule["active"], _schedule["since"]
+        windows = _schedule["windows"] if _schedule["version"] == version else None
+
+    if windows is None:
+        windows = tuple(
+            ManualCategory.objects.filter(start_time__isnull=False, end_time__isnull=False)
+            .values_list("pk", "start_time", "end_time")
+        )
+
+    moment = now.time()
+    active = frozenset(pk for pk, start, end in windows if in_window(start, end, moment))
+    since = previous_boundary(windows, now)
+    with _lock:
+        _schedule.update(
+            version=version, windows=windows, active=active, since=since,
+            valid_from=now, valid_until=next_boundary(windows, now),
+        )
+    return active, since
@@ -0,0 +1,172 @@
+import re
+from collections.abc import Sequence
+
+from django.db import connection, connections
+
+FTS_TABLE = "menuapp_menuitem_fts"
+
+# Schema of the FTS5 index (rowid = menuapp_menuitem.id). Triggers on
+# menuapp_menuitem keep names and descriptions in sync, so bulk_create/bulk_update
+# and queryset.update() writes are covered too. The categories column is kept
+# by app code instead (refresh_search_categories): a trigger naming the
+# category tables would break SQLite's rebuild of those tables in migrations.
+# Everything is IF NOT EXISTS: ensure_search_index() re-runs it after
+# migrations, because SQLite table rebuilds drop a table's triggers.
+CATEGORY_NAMES = """
+    trim(
+        coalesce((SELECT group_concat(c.name, ' ') FROM menuapp_category c
+                  JOIN menuapp_menuitem_categories mc ON mc.category_id = c.id
+                  WHERE mc.menuitem_id = {item}), '')
+        || ' ' ||
+        coalesce((SELECT group_concat(m.name, ' ') FROM menuapp_manualcategory m
+                  JOIN menuapp_menuitem_manual_categories mm ON mm.manualcategory_id = m.id
+                  WHERE mm.menuitem_id = {item}), '')
+    )
+"""
+
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS menuapp_menuitem_fts USING fts5(
+        item_name, description, categories,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_insert AFTER INSERT ON menuapp_menuitem BEGIN
+        INSERT INTO menuapp_menuitem_fts(rowid, item_name, description, categories)
+        VALUES (new.id, new.item_name, coalesce(new.description, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_update AFTER UPDATE OF item_name, description ON menuapp_menuitem BEGIN
+        UPDATE menuapp_menuitem_fts SET item_name = new.item_name, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menuapp_menuitem_fts_delete AFTER DELETE ON menuapp_menuitem BEGIN
+        DELETE FROM menuapp_menuitem_fts WHERE rowid = old.id;
+    END
+    """,
+]
+TRIGGERS = ("menuapp_menuitem_fts_insert", "menuapp_menuitem_fts_update", "menuapp_menuitem_fts_delete")
+
+REFRESH_CATEGORIES = f"""
+    UPDATE menuapp_menuitem_fts SET categories = {CATEGORY_NAMES.format(item='menuapp_menuitem_fts.rowid')}
+    WHERE rowid IN ({{ids}})
+"""
+
+BACKFILL = f"""
+    INSERT INTO menuapp_menuitem_fts(rowid, item_name, description, categories)
+    SELECT id, item_name, coalesce(description, ''), {CATEGORY_NAMES.format(item='menuapp_menuitem.id')}
+    FROM menuapp_menuitem
+"""
+
+
+# bm25 column weights: item_name, description, categories
+RANK = f"bm25({FTS_TABLE}, 10.0, 1.0, 4.0)"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(text: str) -> str:
+    """
+    FTS5 MATCH expression for free text: every word must match, each as a
+    prefix ("chick" finds "chicken"). User input never reaches FTS5 syntax.
+    """
+    return " ".join(f'"{token}"*' for token in _TOKEN.findall(text))
+
+
+class SearchResults(Sequence):
+    """
+    Ids of visible menu items matching `text`, best match first. Only the
+    requested slice is ranked and read, so it can be handed to a paginator.
+    """
+
+    def __init__(self, text: str, hotel_id=None, category_id=None):
+        self.match = match_expression(text)
+        where = [f"{FTS_TABLE} MATCH %s", "i.is_visible"]
+        self.params = [self.match]
+        if hotel_id is not None:
+            where.append("i.hotel_id = %s")
+            self.params.append(hotel_id)
+        if category_id is not None:
+            where.append("i.id IN (SELECT menuitem_id FROM menuapp_menuitem_categories WHERE category_id = %s)")
+            self.params.append(category_id)
+        self.sql = f"FROM {FTS_TABLE} JOIN menuapp_menuitem i ON i.id = {FTS_TABLE}.rowid WHERE {' AND '.join(where)}"
+        self._count = None
+
+    def __len__(self):
+        if not self.match:
+            return 0
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) {self.sql}", self.params)
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += len(self)
+            items = self[index:index + 1]
+            if not items:
+                raise IndexError(index)
+            return items[0]
+        start, stop, _ = index.indices(len(self))
+        if not self.match or stop <= start:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT i.id {self.sql} ORDER BY {RANK}, i.id LIMIT %s OFFSET %s",
+                [*self.params, stop - start, start],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def install_search_index(connection, backfill=False):
+    """Create the FTS5 table and triggers where missing; `backfill` indexes every existing item."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for sql in SCHEMA:
+            cursor.execute(sql)
+        if backfill:
+            cursor.execute(BACKFILL)
+
+
+def refresh_search_categories(item_ids, using="default"):
+    """
+    Re-index the category names of these items. Call it after changing their
+    category links or renaming/deleting a category: menuapp.signals does for
+    m2m changes and category saves, bulk link writes call it themselves.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    item_ids = list(item_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            cursor.execute(REFRESH_CATEGORIES.format(ids=", ".join(["%s"] * len(chunk))), chunk)
+
+
+def ensure_search_index(using="default"):
+    """
+    Reinstall dropped triggers once the index exists (menuapp.signals runs
+    this after migrate). Items written while they were missing aren't
+    indexed, so then the index is rebuilt from the table.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite" or FTS_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join(['%s'] * len(TRIGGERS))})",
+            TRIGGERS,
+        )
+        intact = cursor.fetchone()[0] == len(TRIGGERS)
+        if not intact:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    install_search_index(connection, backfill=not intact)
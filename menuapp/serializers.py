@@ -1,17 +1,101 @@
 from rest_framework import serializers
-from .models import Hotel, MenuItem
+from .models import Hotel, ImportJob, MenuItem
 from django.conf import settings
 
 
+def image_sizes(variants, request=None):
+    """MenuItem.image_variants with media paths turned into (absolute) URLs."""
+    sizes = {}
+    for size, variant in (variants or {}).items():
+        src = f"{settings.MEDIA_URL}{variant['src']}"
+        webp = f"{settings.MEDIA_URL}{variant['webp']}"
+        sizes[size] = {
+            'width': variant['width'],
+            'url': request.build_absolute_uri(src) if request else src,
+            'webp': request.build_absolute_uri(webp) if request else webp,
+        }
+    return sizes
+
+
+def _names_by_item(through, item_ids, field):
+    """{menu item id: [names]} for one M2M relation, in one query ordered by name."""
+    names = {}
+    rows = (
+        through.objects.filter(menuitem_id__in=item_ids)
+        .order_by(f"{field}__name")
+        .values_list("menuitem_id", f"{field}__name")
+    )
+    for item_id, name in rows:
+        names.setdefault(item_id, []).append(name)
+    return names
+
+
+def serialize_menu_items(items, request=None, with_hotel=False) -> list:
+    """
+    Same output as MenuItemSerializer(items, many=True).data, built from
+    values() rows: URL prefixes are resolved once, and categories / manual
+    categories come from one query each instead of per-item managers.
+    `items` is a MenuItem queryset; its ordering is kept. `with_hotel` adds
+    each item's "hotel_id", read in the same query as the rest of the row.
+    """
+    media_url = request.build_absolute_uri(settings.MEDIA_URL) if request else settings.MEDIA_URL
+    placeholder = f"{media_url}no_image.jpg"
+
+    rows = list(items.values_list(
+        'id', 'item_name', 'price', 'description', 'image_local', 'image_url', 'image_variants', 'is_visible',
+        'hotel_id',
+    ))
+    item_ids = items.values('pk')
+    categories = _names_by_item(MenuItem.categories.through, item_ids, 'category')
+    manual_categories = _names_by_item(MenuItem.manual_categories.through, item_ids, 'manualcategory')
+
+    data = []
+    for pk, item_name, price, description, image_local, image_url, variants, is_visible, hotel_id in rows:
+        sizes = {
+            size: {
+                'width': variant['width'],
+                'url': f"{media_url}{variant['src']}",
+                'webp': f"{media_url}{variant['webp']}",
+            }
+            for size, variant in (variants or {}).items()
+        }
+        item = {
+            'id': pk,
+            'item_name': item_name,
+            'price': f"{price:f}" if price is not None else None,
+            'categories': categories.get(pk, []),
+            'manual_categories': manual_categories.get(pk, []),
+            'description': description,
+            'image': f"{media_url}{image_local}" if image_local else (image_url or placeholder),
+            'image_sizes': sizes,
+            'image_srcset': ", ".join(f"{s['url']} {s['width']}w" for s in sizes.values()) or None,
+            'is_visible': is_visible,
+        }
+        if with_hotel:
+            item['hotel_id'] = hotel_id
+        data.append(item)
+    return data
+
+
+def menus_by_hotel(hotel_ids, request=None) -> dict:
+    """Visible menus of several hotels, {hotel_id: [item, ...]}, in the same few queries as one menu."""
+    items = MenuItem.objects.filter(hotel_id__in=hotel_ids, is_visible=True).order_by('hotel_id', 'pk')
+    menus = {pk: [] for pk in hotel_ids}
+    for item in serialize_menu_items(items, request, with_hotel=True):
+        menus[item.pop('hotel_id')].append(item)
+    return menus
+
 
 class MenuItemSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_sizes = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     categories = serializers.SerializerMethodField()
     manual_categories = serializers.SerializerMethodField()
 
     class Meta:
         model = MenuItem
-        fields = ('id', 'item_name', 'price', 'categories', 'manual_categories', 'description', 'image', 'is_visible')
+        fields = ('id', 'item_name', 'price', 'categories', 'manual_categories', 'description', 'image', 'image_sizes', 'image_srcset', 'is_visible')
 
     def get_image(self, obj):
         request = self.context.get('request')
@@ -30,6 +114,14 @@ class MenuItemSerializer(serializers.ModelSerializer):
         # ✅ Case 3: Default placeholder (optional)
         return request.build_absolute_uri(f"{settings.MEDIA_URL}no_image.jpg") if request else f"{settings.MEDIA_URL}no_image.jpg"
 
+    def get_image_sizes(self, obj):
+        # ✅ Resized renditions: {"thumbnail": {"width": 200, "url": .., "webp": ..}, ...}
+        return image_sizes(obj.image_variants, self.context.get('request'))
+
+    def get_image_srcset(self, obj):
+        sizes = image_sizes(obj.image_variants, self.context.get('request'))
+        return ", ".join(f"{s['url']} {s['width']}w" for s in sizes.values()) or None
+
     def get_categories(self, obj):
         return [cat.name for cat in obj.categories.all()]
 
@@ -37,12 +129,23 @@ class MenuItemSerializer(serializers.ModelSerializer):
         return [cat.name for cat in obj.manual_categories.all()]  # ✅ now reads from new model
 
 class HotelSerializer(serializers.ModelSerializer):
-    menu_count = serializers.IntegerField(source='menu_items.count', read_only=True)
+    """
+    Counts are read from `menu_count` / `visible_menu_count` annotations (see
+    HotelListAPI); pass context include_counts=False to leave them out.
+    """
+    menu_count = serializers.IntegerField(read_only=True)
+    visible_menu_count = serializers.IntegerField(read_only=True)
     logo = serializers.SerializerMethodField()
 
     class Meta:
         model = Hotel
-        fields = ('id', 'name', 'uploaded_at', 'menu_count', 'logo')
+        fields = ('id', 'name', 'uploaded_at', 'menu_count', 'visible_menu_count', 'logo')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('include_counts', True):
+            self.fields.pop('menu_count')
+            self.fields.pop('visible_menu_count')
 
     def get_logo(self, obj):
         request = self.context.get('request')
@@ -68,6 +171,22 @@ class HotelDetailSerializer(serializers.ModelSerializer):
         return None
 
     def get_menu(self, obj):
+        # Batch fetches pass every hotel's menu in at once (menus_by_hotel)
+        menus = self.context.get('menus')
+        if menus is not None:
+            return menus.get(obj.pk, [])
         # ✅ Filter visible menu items only
-        items = obj.menu_items.filter(is_visible=True).prefetch_related('categories', 'manual_categories')
-        return MenuItemSerializer(items, many=True, context=self.context).data
\ No newline at end of file
+        items = obj.menu_items.filter(is_visible=True)
+        # Flat values() path; MenuItemSerializer per item was most of this endpoint's time
+        return serialize_menu_items(items, self.context.get('request'))
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = (
+            'id', 'hotel_name', 'mode', 'status', 'rows_parsed', 'images_total', 'images_fetched',
+            'items_imported', 'summary', 'skipped', 'error', 'created_at', 'started_at', 'heartbeat_at',
+            'finished_at',
+        )
+        read_only_fields = fields
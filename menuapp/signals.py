@@ -0,0 +1,137 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from .api_keys import invalidate_api_keys
+from .models import AllowedApp, Category, Hotel, ManualCategory, MenuItem, MenuVersion, Tombstone
+from .search import ensure_search_index, refresh_search_categories
+from .sync import record_tombstones, touch_items
+
+_pending = threading.local()
+
+
+def bump_menu_version(hotel_ids=(), categories=False):
+    """
+    Record that menu data changed (for the given hotels / categories). The
+    MenuVersion rows are bumped once when the surrounding transaction
+    commits, however many rows changed inside it. Bulk writes
+    (bulk_create/update, queryset.update) don't send signals, so code doing
+    them calls this directly.
+    """
+    keys = {MenuVersion.GLOBAL} | {MenuVersion.hotel_key(pk) for pk in hotel_ids if pk}
+    if categories:
+        keys.add(MenuVersion.CATEGORIES)
+    _pending.keys = getattr(_pending, "keys", set()) | keys
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    keys = getattr(_pending, "keys", None)
+    if not keys:
+        return
+    _pending.keys = set()
+    MenuVersion.bump(keys)
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def hotel_changed(sender, instance, **kwargs):
+    bump_menu_version([instance.pk])
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def menu_item_changed(sender, instance, **kwargs):
+    bump_menu_version([instance.hotel_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ManualCategory)
+@receiver(post_delete, sender=ManualCategory)
+def category_changed(sender, **kwargs):
+    bump_menu_version(categories=True)
+
+
+def categories_relinked(item_ids):
+    """Items' category names changed: re-index them for search and mark them changed for /api/sync/."""
+    item_ids = list(item_ids)
+    if item_ids:
+        refresh_search_categories(item_ids)
+        touch_items(item_ids)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=ManualCategory)
+def category_saved(sender, instance, created, **kwargs):
+    if not created:
+        # Items carry their category names, so a rename changes them for search and /api/sync/
+        categories_relinked(instance.menu_items.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=ManualCategory)
+def category_deleting(sender, instance, **kwargs):
+    # Links go with the category; the items' category lists change once it's gone
+    instance._linked_item_ids = list(instance.menu_items.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=ManualCategory)
+def category_gone(sender, instance, **kwargs):
+    categories_relinked(instance.__dict__.pop("_linked_item_ids", ()))
+
+
+@receiver(m2m_changed, sender=MenuItem.categories.through)
+@receiver(m2m_changed, sender=MenuItem.manual_categories.through)
+def menu_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        # post_clear doesn't say which items lost the link
+        instance._clearing_item_ids = list(instance.menu_items.values_list("pk", flat=True))
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # Changed from the category side: the affected items may be in any hotel
+        bump_menu_version(categories=True)
+        categories_relinked(pk_set if action != "post_clear" else instance.__dict__.pop("_clearing_item_ids", ()))
+    else:
+        bump_menu_version([instance.hotel_id])
+        categories_relinked([instance.pk])
+
+
+# --- Tombstones for /api/sync/ ---
+
+@receiver(post_delete, sender=Hotel)
+def hotel_deleted(sender, instance, **kwargs):
+    record_tombstones(Tombstone.KIND_HOTEL, [instance.pk])
+
+
+@receiver(post_delete, sender=MenuItem)
+def menu_item_deleted(sender, instance, **kwargs):
+    record_tombstones(Tombstone.KIND_ITEM, [instance.pk], hotel_id=instance.hotel_id)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    record_tombstones(Tombstone.KIND_CATEGORY, [instance.pk])
+
+
+@receiver(post_delete, sender=ManualCategory)
+def manual_category_deleted(sender, instance, **kwargs):
+    record_tombstones(Tombstone.KIND_MANUAL_CATEGORY, [instance.pk])
+
+
+@receiver(post_save, sender=AllowedApp)
+@receiver(post_delete, sender=AllowedApp)
+def allowed_app_changed(sender, **kwargs):
+    # After commit, so no request re-caches the old state in between
+    transaction.on_commit(invalidate_api_keys)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, **kwargs):
+    # Migrations that rebuild menuapp tables on SQLite drop the FTS triggers with them
+    if sender.name == "menuapp":
+        ensure_search_index(using)
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.utils.deconstruct import deconstructible
+
+# Files under this prefix never change once written, so they can be cached forever
+CONTENT_PREFIX = "images"
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Media storage that names files by the SHA-256 of their bytes:
+    images/<first two hex chars>/<sha256>.<ext>
+
+    Identical bytes are stored once no matter how many hotels or items use
+    them, and different images can never overwrite each other. Whatever
+    name the caller asks for, only its extension is kept.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save()
+        return name
+
+    def _save(self, name, content):
+        return self.store(content.chunks(), os.path.splitext(name)[1])
+
+    def store(self, chunks, ext: str) -> str:
+        """Write an iterable of byte chunks in one pass; returns the content-addressed name."""
+        ext = ext.lower()
+        if ext and not ext.startswith("."):
+            ext = f".{ext}"
+
+        os.makedirs(self.location, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.location, prefix=".incoming-")
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in chunks:
+                    if chunk:
+                        digest.update(chunk)
+                        tmp.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = f"{CONTENT_PREFIX}/{hexdigest[:2]}/{hexdigest}{ext}"
+            full_path = self.path(name)
+            if self.touch(name):
+                os.remove(tmp_path)
+                return name
+
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            # Atomic: concurrent writers of the same bytes just replace each other
+            os.replace(tmp_path, full_path)
+            return name
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def touch(self, name) -> bool:
+        """
+        Mark a stored file as just used by resetting its mtime, so cleanup
+        (which leaves files younger than MEDIA_GRACE_MINUTES) won't remove it
+        while an import is about to reference it. False if it doesn't exist.
+        """
+        try:
+            os.utime(self.path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+content_store = ContentAddressedStorage()
+
+# File types a resized rendition can be written as (see menuapp.imaging)
+VARIANT_FORMATS = ("jpg", "png", "webp")
+
+
+def variant_name(name: str, size: str, ext: str) -> str:
+    """
+    Where the `size` rendition of stored image `name` lives. Renditions of
+    content-addressed images sit next to the original and are just as immutable.
+    """
+    if name.startswith(f"{CONTENT_PREFIX}/"):
+        base = os.path.splitext(name)[0]
+    else:
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        base = f"variants/{digest[:2]}/{digest}"
+    return f"{base}-{size}.{ext}"
+
+
+def delete_unreferenced_files(names) -> int:
+    """
+    Delete media files (and their resized renditions) that no MenuItem image or
+    Hotel logo points at any more. Call after the referencing rows are gone;
+    shared files are kept. Content-addressed files used within the last
+    MEDIA_GRACE_MINUTES are kept too: an import may be about to reference
+    them again (gc_media removes them later). Returns files removed.
+    """
+    from django.conf import settings
+    from .models import Hotel, MenuItem
+
+    names = {str(n) for n in names if n}
+    if not names:
+        return 0
+
+    referenced = set(MenuItem.objects.filter(image_local__in=names).values_list("image_local", flat=True))
+    referenced |= set(Hotel.objects.filter(logo__in=names).values_list("logo", flat=True))
+
+    sizes = getattr(settings, "IMAGE_VARIANT_WIDTHS", {})
+    grace_cutoff = time.time() - getattr(settings, "MEDIA_GRACE_MINUTES", 60) * 60
+    removed = 0
+    for name in names - referenced:
+        if name.startswith(f"{CONTENT_PREFIX}/") and _mtime(name) >= grace_cutoff:
+            continue
+        files = [name] + [variant_name(name, size, ext) for size in sizes for ext in VARIANT_FORMATS]
+        for path in files:
+            try:
+                if content_store.exists(path):
+                    content_store.delete(path)
+                    removed += 1
+            except Exception as e:
+                print(f"[Delete Image Error] {path} | Error: {e}")
+    return removed
+
+
+def _mtime(name) -> float:
+    try:
+        return os.path.getmtime(content_store.path(name))
+    except OSError:
+        return 0.0
+
+
+# One background thread: unlinks never hold up the request that deleted the rows
+_cleanup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="media-cleanup")
+
+
+def _cleanup(names):
+    try:
+        delete_unreferenced_files(names)
+    except Exception as e:
+        print(f"[Media Cleanup Error] {e}")
+    finally:
+        connection.close()
+
+
+def schedule_file_cleanup(names):
+    """
+    delete_unreferenced_files(names) on the cleanup thread once the current
+    transaction commits; nothing is removed if it rolls back. References are
+    checked when it runs, so files other rows still use are kept.
+    Returns how many names were queued.
+    """
+    names = {str(n) for n in names if n}
+    if not names:
+        return 0
+    transaction.on_commit(lambda: _cleanup_pool.submit(_cleanup, names))
+    return len(names)
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Category, Hotel, ManualCategory, MenuItem, Tombstone
+from .serializers import HotelSerializer, serialize_menu_items
+
+
+def make_token(moment) -> str:
+    """Opaque sync token for a point in time (microseconds since the epoch)."""
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def parse_token(token: str):
+    """Point in time of a sync token; ValueError if it isn't one."""
+    return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+
+
+def touch_items(pks):
+    """Mark menu items changed for sync when something they embed (e.g. category names) changed."""
+    if isinstance(pks, (list, tuple, set)) and not pks:
+        return
+    MenuItem.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+
+def record_tombstones(kind, ids, hotel_id=None):
+    """Remember deleted rows so the next sync tells clients to drop them."""
+    Tombstone.objects.bulk_create(
+        [Tombstone(kind=kind, object_id=pk, hotel_id=hotel_id) for pk in ids], batch_size=500
+    )
+
+
+def _time(value):
+    return value.strftime("%H:%M") if value else None
+
+
+def changes_since(since, request, hotel_id=None) -> dict:
+    """
+    Everything a client needs to bring its copy up to date from `since`
+    (None = first sync): changed hotels, categories and visible items, plus
+    ids to drop (deleted rows, and items hidden since). A `since` older than
+    SYNC_TOMBSTONE_DAYS can't be answered from tombstones, so the client gets
+    a full copy with "reset": true and must discard what it has.
+
+    The returned token lies SYNC_OVERLAP_SECONDS in the past, so rows
+    committed by transactions still running now are picked up next time;
+    clients just see a few changes twice.
+    """
+    now = timezone.now()
+    retention = timedelta(days=getattr(settings, "SYNC_TOMBSTONE_DAYS", 90))
+    reset = since is None or since < now - retention
+    token = make_token(now - timedelta(seconds=getattr(settings, "SYNC_OVERLAP_SECONDS", 60)))
+
+    hotels = Hotel.objects.order_by("pk")
+    items = MenuItem.objects.order_by("pk")
+    categories = Category.objects.order_by("pk")
+    manual_categories = ManualCategory.objects.order_by("pk")
+    tombstones = Tombstone.objects.none()
+    if not reset:
+        hotels = hotels.filter(updated_at__gte=since)
+        items = items.filter(updated_at__gte=since)
+        categories = categories.filter(updated_at__gte=since)
+        manual_categories = manual_categories.filter(updated_at__gte=since)
+        tombstones = Tombstone.objects.filter(deleted_at__gte=since)
+    if hotel_id is not None:
+        hotels = hotels.filter(pk=hotel_id)
+        items = items.filter(hotel_id=hotel_id)
+        tombstones = tombstones.filter(
+            Q(kind=Tombstone.KIND_ITEM, hotel_id=hotel_id)
+            | Q(kind=Tombstone.KIND_HOTEL, object_id=hotel_id)
+            | Q(kind__in=[Tombstone.KIND_CATEGORY, Tombstone.KIND_MANUAL_CATEGORY])
+        )
+
+    visible = items.filter(is_visible=True)
+    deleted = {"hotels": [], "items": [], "categories": [], "manual_categories": []}
+    if not reset:
+        deleted["items"] = list(items.filter(is_visible=False).values_list("pk", flat=True))
+    lists = {
+        Tombstone.KIND_HOTEL: deleted["hotels"],
+        Tombstone.KIND_ITEM: deleted["items"],
+        Tombstone.KIND_CATEGORY: deleted["categories"],
+        Tombstone.KIND_MANUAL_CATEGORY: deleted["manual_categories"],
+    }
+    for kind, object_id in tombstones.values_list("kind", "object_id"):
+        lists[kind].append(object_id)
+
+    return {
+        "token": token,
+        "reset": reset,
+        "hotels": HotelSerializer(hotels, many=True, context={"request": request, "include_counts": False}).data,
+        "categories": list(categories.values("id", "name")),
+        "manual_categories": [
+            {"id": pk, "name": name, "start_time": _time(start), "end_time": _time(end)}
+            for pk, name, start, end in manual_categories.values_list("pk", "name", "start_time", "end_time")
+        ],
+        "items": serialize_menu_items(visible, request, with_hotel=True),
+        "deleted": deleted,
+    }
@@ -1,3 +1,890 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, migrations, models
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.renderers import JSONRenderer
+
+from .api_keys import SHARED_KEY, AppKey, active_keys, invalidate_api_keys
+from .deletion import HANDLED_RELATIONS, check_relations, delete_hotels, delete_menu_items
+from .edits import apply_menu_edits, parse_ops
+from .importer import WorkbookError, claim_next_job, import_menu
+from . import ratelimit, unified
+from .models import AllowedApp, Category, Hotel, ImportJob, ManualCategory, MenuItem, MenuVersion, Tombstone
+from .renderers import FastJSONRenderer
+from .response_cache import menu_cache
+from .search import SearchResults
+from .serializers import menus_by_hotel, serialize_menu_items
+from .storage import content_store, delete_unreferenced_files
+from .sync import make_token
+from .unified import SeededOrder
+
+
+def search(text):
+    return list(SearchResults(text))
+
+
+class SearchCategoriesTests(TestCase):
+    """The categories column of the search index follows links, renames and deletes."""
+
+    def setUp(self):
+        self.hotel = Hotel.objects.create(name="Seaside")
+        self.item = MenuItem.objects.create(hotel=self.hotel, item_name="Pancakes")
+        self.category = Category.objects.create(name="Breakfast")
+
+    def test_link_from_either_side(self):
+        self.item.categories.add(self.category)
+        self.assertEqual(search("breakfast"), [self.item.pk])
+        self.category.menu_items.remove(self.item)
+        self.assertEqual(search("breakfast"), [])
+        ManualCategory.objects.create(name="Brunch-09:00-12:00").menu_items.add(self.item)
+        self.assertEqual(search("brunch"), [self.item.pk])
+
+    def test_rename_and_delete(self):
+        self.item.categories.add(self.category)
+        self.category.name = "Morning"
+        self.category.save()
+        self.assertEqual(search("breakfast"), [])
+        self.assertEqual(search("morning"), [self.item.pk])
+        self.category.delete()
+        self.assertEqual(search("morning"), [])
+
+    def test_batch_edit(self):
+        apply_menu_edits(parse_ops([
+            {"op": "categories", "ids": [self.item.pk], "type": "auto", "category_ids": [self.category.pk]},
+        ]))
+        self.assertEqual(search("breakfast"), [self.item.pk])
+
+
+class CategoryRebuildTests(TransactionTestCase):
+    """SQLite rebuilds a table to add a column; nothing in the search index may stand in its way."""
+
+    def apply(self, operation):
+        state = MigrationLoader(connection).project_state()
+        new_state = state.clone()
+        operation.state_forwards("menuapp", new_state)
+        with connection.schema_editor() as editor:
+            operation.database_forwards("menuapp", editor, state, new_state)
+        return lambda: self._revert(operation, state, new_state)
+
+    def _revert(self, operation, state, new_state):
+        with connection.schema_editor() as editor:
+            operation.database_backwards("menuapp", editor, new_state, state)
+
+    def test_add_field_to_populated_category_tables(self):
+        hotel = Hotel.objects.create(name="Seaside")
+        items = [MenuItem.objects.create(hotel=hotel, item_name=f"Dish {n}") for n in range(3)]
+        category = Category.objects.create(name="Breakfast")
+        manual = ManualCategory.objects.create(name="Brunch-09:00-12:00")
+        category.menu_items.add(*items)
+        manual.menu_items.add(items[0])
+
+        for model_name in ("category", "manualcategory"):
+            revert = self.apply(migrations.AddField(model_name, "note", models.CharField(max_length=50, default="")))
+            try:
+                self.assertEqual(MenuItem.categories.through.objects.count(), 3)
+                self.assertEqual(MenuItem.manual_categories.through.objects.count(), 1)
+                self.assertEqual(sorted(search("breakfast")), [item.pk for item in items])
+                self.assertEqual(search("brunch"), [items[0].pk])
+            finally:
+                revert()
+
+        category.name = "Morning"
+        category.save()
+        self.assertEqual(sorted(search("morning")), [item.pk for item in items])
+
+
+class WorkbookMixin:
+    def workbook(self, rows, header=("name", "price", "category", "description")):
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        wb = Workbook()
+        wb.active.append(header)
+        for row in rows:
+            wb.active.append(row)
+        wb.save(path)
+        return path
+
+    def names(self):
+        return sorted(self.hotel.menu_items.values_list("item_name", flat=True))
+
+
+class SyncImportTests(WorkbookMixin, TestCase):
+    """import_menu in sync mode: diff against the current menu, keep what staff set."""
+
+    def setUp(self):
+        summary = import_menu(self.workbook([
+            ("Pancakes", 4.5, "Breakfast", "Fluffy"),
+            ("Omelette", 6, "Breakfast", "Three eggs"),
+            ("Soup", 5, "Lunch", None),
+        ]), "Seaside")
+        self.assertEqual(summary["created"], 3)
+        self.hotel = Hotel.objects.get(name="Seaside")
+        self.items = {item.item_name: item for item in self.hotel.menu_items.all()}
+
+    def test_diff_counts_and_kept_fields(self):
+        pancakes, omelette = self.items["Pancakes"], self.items["Omelette"]
+        MenuItem.objects.filter(pk=pancakes.pk).update(is_visible=False)
+        manual = ManualCategory.objects.create(name="Brunch-09:00-12:00")
+        omelette.manual_categories.add(manual)
+
+        summary = import_menu(self.workbook([
+            ("Pancakes", 4.5, "Breakfast", "Fluffy"),    # unchanged
+            ("Omelette", 7, "Breakfast", "Three eggs"),  # new price
+            ("Waffles", 5, "Breakfast", None),           # new
+        ]), "Seaside")
+
+        self.assertEqual(
+            {k: summary[k] for k in ("created", "updated", "unchanged", "deleted")},
+            {"created": 1, "updated": 1, "unchanged": 1, "deleted": 1},
+        )
+        self.assertEqual(self.names(), ["Omelette", "Pancakes", "Waffles"])
+        pancakes.refresh_from_db()
+        omelette.refresh_from_db()
+        self.assertFalse(pancakes.is_visible)
+        self.assertEqual(omelette.pk, self.items["Omelette"].pk)
+        self.assertEqual(omelette.price, Decimal("7.000"))
+        self.assertEqual(list(omelette.manual_categories.all()), [manual])
+
+    def test_duplicate_names_merge(self):
+        summary = import_menu(self.workbook([
+            ("Pancakes", 4.5, "Breakfast", "Fluffy"),
+            ("  PANCAKES ", None, "Sweet", "ignored, already described"),
+            ("Omelette", 6, "Breakfast", "Three eggs"),
+            ("Soup", 5, "Lunch", None),
+            ("Soup", None, None, "Of the day"),
+        ]), "Seaside")
+
+        self.assertEqual(summary["updated"], 2)
+        self.assertEqual(summary["unchanged"], 1)
+        self.assertEqual(self.names(), ["Omelette", "Pancakes", "Soup"])
+        pancakes = MenuItem.objects.get(pk=self.items["Pancakes"].pk)
+        self.assertEqual(pancakes.description, "Fluffy")
+        self.assertEqual(sorted(pancakes.categories.values_list("name", flat=True)), ["Breakfast", "Sweet"])
+        self.assertEqual(MenuItem.objects.get(pk=self.items["Soup"].pk).description, "Of the day")
+        self.assertEqual(search("sweet"), [pancakes.pk])
+
+    def test_existing_names_differing_only_by_case_or_accents(self):
+        MenuItem.objects.bulk_create([
+            MenuItem(hotel=self.hotel, item_name=name, normalized_name=key)
+            for name, key in (("Tea", "tea"), ("tea", "tea"), ("Cafe", "cafe"), ("Café", "cafe"))
+        ])
+        by_name = dict(self.hotel.menu_items.values_list("item_name", "pk"))
+
+        summary = import_menu(self.workbook([
+            ("tea", 2, "Drinks", None),
+            ("Café", 3, "Drinks", None),
+            ("Soup", 5, "Lunch", None),
+        ]), "Seaside")
+
+        self.assertEqual(self.names(), ["Café", "Soup", "tea"])
+        self.assertEqual(MenuItem.objects.get(item_name="tea").pk, by_name["tea"])
+        self.assertEqual(MenuItem.objects.get(item_name="Café").pk, by_name["Café"])
+        self.assertEqual(summary["deleted"], 4)  # Pancakes, Omelette and the two duplicates
+
+    def test_rename_onto_another_casing(self):
+        MenuItem.objects.bulk_create([MenuItem(hotel=self.hotel, item_name="SOUP", normalized_name="soup")])
+        import_menu(self.workbook([("soup", 5, "Lunch", None)]), "Seaside")
+        self.assertEqual(self.names(), ["soup"])
+        self.assertEqual(MenuItem.objects.get(item_name="soup").pk, self.items["Soup"].pk)
+
+    def test_stale_items_deleted_in_bulk(self):
+        MenuItem.objects.bulk_create([
+            MenuItem(hotel=self.hotel, item_name=f"Old {n}", normalized_name=f"old {n}", image_local=f"images/ab/{n}.jpg")
+            for n in range(200)
+        ])
+        path = self.workbook([("Soup", 5, "Lunch", None)])
+        with mock.patch("menuapp.importer.schedule_file_cleanup") as cleanup, \
+                CaptureQueriesContext(connection) as queries:
+            summary = import_menu(path, "Seaside")
+
+        self.assertEqual(summary["deleted"], 202)
+        self.assertLess(len(queries), 60)
+        self.assertEqual(Tombstone.objects.filter(kind=Tombstone.KIND_ITEM).count(), 202)
+        queued = {name for call in cleanup.call_args_list for name in call.args[0] if name}
+        self.assertEqual(queued, {f"images/ab/{n}.jpg" for n in range(200)})
+
+    def test_unrecognized_name_header_changes_nothing(self):
+        path = self.workbook([("Pancakes", 4.5)], header=("dish", "price"))
+        with self.assertRaises(WorkbookError):
+            import_menu(path, "Seaside")
+        self.assertEqual(self.names(), ["Omelette", "Pancakes", "Soup"])
+
+    def test_no_importable_rows_changes_nothing(self):
+        path = self.workbook([(None, 4.5, "Breakfast", None)])
+        with self.assertRaises(WorkbookError):
+            import_menu(path, "Seaside")
+        self.assertEqual(self.names(), ["Omelette", "Pancakes", "Soup"])
+
+
+class ReplaceImportTests(WorkbookMixin, TestCase):
+    """import_menu in replace mode rebuilds the menu, but never leaves it half deleted."""
+
+    def setUp(self):
+        import_menu(self.workbook([
+            ("Pancakes", 4.5, "Breakfast", "Fluffy"),
+            ("Omelette", 6, "Breakfast", "Three eggs"),
+            ("Soup", 5, "Lunch", None),
+        ]), "Seaside")
+        self.hotel = Hotel.objects.get(name="Seaside")
+        MenuItem.objects.filter(item_name="Pancakes").update(is_visible=False)
+
+    def test_replace(self):
+        old = set(self.hotel.menu_items.values_list("pk", flat=True))
+        summary = import_menu(self.workbook([
+            ("Pancakes", 5, "Breakfast", None),
+            ("Waffles", 5, "Breakfast", None),
+        ]), "Seaside", mode=ImportJob.MODE_REPLACE)
+
+        self.assertEqual((summary["created"], summary["deleted"]), (2, 3))
+        self.assertEqual(self.names(), ["Pancakes", "Waffles"])
+        self.assertFalse(old & set(self.hotel.menu_items.values_list("pk", flat=True)))
+        self.assertTrue(MenuItem.objects.get(item_name="Pancakes").is_visible)
+        self.assertEqual(MenuItem.objects.get(item_name="Pancakes").description, None)
+
+    @override_settings(IMPORT_BATCH_SIZE=1)
+    def test_failure_midway_keeps_the_old_menu(self):
+        path = self.workbook([("Pancakes", 5, "Breakfast", None), ("Waffles", 5, "Breakfast", None)])
+        with mock.patch("menuapp.importer.build_variants_many", side_effect=[{}, RuntimeError("worker killed")]):
+            with self.assertRaises(RuntimeError):
+                import_menu(path, "Seaside", mode=ImportJob.MODE_REPLACE)
+        self.assertEqual(self.names(), ["Omelette", "Pancakes", "Soup"])
+
+    def test_image_progress_writes_are_throttled(self):
+        urls = [f"https://example.com/{n}.jpg" for n in range(100)]
+
+        def fetch_images(urls, hotel_name, on_done=None):
+            for done in range(1, len(urls) + 1):
+                on_done(done, len(urls))
+            return {}
+
+        job = ImportJob.objects.create(hotel_name="Seaside", file="uploads/menu.xlsx")
+        path = self.workbook([(f"Dish {n}", 1, None, None, url) for n, url in enumerate(urls)],
+                             header=("name", "price", "category", "description", "image"))
+        with mock.patch("menuapp.importer.fetch_images", side_effect=fetch_images), \
+                mock.patch("menuapp.importer._save_progress") as save_progress:
+            import_menu(path, "Seaside", job=job, mode=ImportJob.MODE_REPLACE)
+        image_writes = [c for c in save_progress.call_args_list if "images_fetched" in c.kwargs]
+        self.assertEqual(len(image_writes), 1)
+        self.assertEqual(image_writes[0].kwargs["images_fetched"], 100)
+
+
+class ImportJobQueueTests(TestCase):
+    def job(self, status, **fields):
+        return ImportJob.objects.create(hotel_name="Seaside", file="uploads/menu.xlsx", status=status, **fields)
+
+    def test_stale_running_jobs_are_failed(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        killed = self.job(ImportJob.STATUS_RUNNING, started_at=long_ago, heartbeat_at=long_ago)
+        never_reported = self.job(ImportJob.STATUS_RUNNING, started_at=long_ago)
+        alive = self.job(ImportJob.STATUS_RUNNING, started_at=long_ago, heartbeat_at=timezone.now())
+        queued = self.job(ImportJob.STATUS_QUEUED)
+
+        claimed = claim_next_job()
+
+        self.assertEqual(claimed.pk, queued.pk)
+        self.assertIsNotNone(claimed.heartbeat_at)
+        for job in (killed, never_reported):
+            job.refresh_from_db()
+            self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+            self.assertTrue(job.error)
+            self.assertIsNotNone(job.finished_at)
+        alive.refresh_from_db()
+        self.assertEqual(alive.status, ImportJob.STATUS_RUNNING)
+
+
+class KeysetCursorTests(TestCase):
+    """/api/menu/items/ cursors: pages chain, and foreign or crafted cursors are a 404, not a 500."""
+
+    def setUp(self):
+        invalidate_api_keys()
+        self.key = AllowedApp.objects.create(app_name="Tests", rate_per_minute=0).api_key
+        hotel = Hotel.objects.create(name="Seaside")
+        MenuItem.objects.bulk_create([MenuItem(hotel=hotel, item_name=f"Dish {n:02}") for n in range(5)])
+
+    def get(self, **params):
+        return self.client.get("/api/menu/items/", {"page_size": 2, **params}, HTTP_X_APP_KEY=self.key)
+
+    def next_cursor(self, page):
+        return parse_qs(urlsplit(page["next"]).query)["cursor"][0]
+
+    def cursor(self, data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def test_pages_chain(self):
+        names, params = [], {}
+        while True:
+            page = self.get(**params).json()
+            names += [item["item_name"] for item in page["results"]]
+            if not page["next"]:
+                break
+            params = {"cursor": self.next_cursor(page)}
+        self.assertEqual(names, [f"Dish {n:02}" for n in range(5)])
+
+    def test_cursor_of_other_ordering(self):
+        cursor = self.next_cursor(self.get().json())
+        self.assertEqual(self.get(cursor=cursor, order="hotel").status_code, 404)
+
+    def test_crafted_cursors(self):
+        for data in (
+            {"o": "item_name", "k": [{"a": 1}, 1], "r": False},
+            {"o": "item_name", "k": [3, 1], "r": False},
+            {"o": "item_name", "k": ["Dish", True], "r": False},
+            {"o": "hotel_id", "k": ["Dish", 1], "r": False},
+            {"k": ["Dish", 1], "r": False},
+            ["Dish", 1],
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self.get(cursor=self.cursor(data)).status_code, 404)
+        self.assertEqual(self.get(cursor=self.cursor({"o": "hotel_id", "k": [1, 1], "r": False}), order="hotel").status_code, 200)
+
+
+class MediaCleanupTests(TestCase):
+    """Files an import may be reusing right now survive gc_media and the cleanup thread."""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        settings_override = override_settings(MEDIA_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.hour_ago = time.time() - 7200
+
+    def write(self, name, age=None):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x")
+        if age:
+            os.utime(path, (age, age))
+        return name
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.root, name))
+
+    def test_dedup_hit_refreshes_mtime(self):
+        name = content_store.store([b"same bytes"], "jpg")
+        os.utime(content_store.path(name), (self.hour_ago, self.hour_ago))
+        self.assertEqual(content_store.store([b"same bytes"], "jpg"), name)
+        self.assertGreater(os.path.getmtime(content_store.path(name)), self.hour_ago + 3600)
+        self.assertEqual(delete_unreferenced_files([name]), 0)
+        self.assertTrue(content_store.exists(name))
+
+    def test_gc_media(self):
+        old_orphan = self.write("images/aa/old.jpg", age=self.hour_ago)
+        young_orphan = self.write("images/bb/young.jpg")
+        young_variant = self.write("images/bb/young-thumbnail.webp", age=self.hour_ago)
+        incoming = self.write(".incoming-abc", age=time.time() - 2 * 86400)
+        asset = self.write("no_image.jpg", age=self.hour_ago)
+
+        call_command("gc_media", stdout=io.StringIO())
+
+        self.assertFalse(self.exists(old_orphan))
+        self.assertFalse(self.exists(incoming))
+        for name in (young_orphan, young_variant, asset):
+            self.assertTrue(self.exists(name), name)
+
+
+class FastJSONRendererTests(TestCase):
+    def test_matches_drf(self):
+        data = {
+            "counts": {1: "one", 2: "two"},
+            "text": "line\u2028separator\u2029paragraph",
+            "price": Decimal("1.250"),
+            "when": datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+            "items": [{"id": 1, "name": "Café"}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class APIKeyCacheTests(TestCase):
+    @override_settings(API_KEY_CACHE_ALIAS="default", API_KEY_CACHE_SECONDS=30)
+    def test_shared_entry_expires(self):
+        invalidate_api_keys()
+        app = AllowedApp.objects.create(app_name="Tests")
+        with mock.patch.object(caches["default"], "set", wraps=caches["default"].set) as cache_set:
+            self.assertEqual([key.id for key in active_keys().values()], [app.pk])
+        cache_set.assert_called_once_with(SHARED_KEY, mock.ANY, timeout=30)
+        invalidate_api_keys()
+
+
+@override_settings(RATE_LIMIT_CACHE_ALIAS=None, RATE_LIMIT_PER_MINUTE=120, RATE_LIMIT_BURST=30,
+                   RATE_LIMIT_DAILY_QUOTA=None)
+class RateLimitTests(TestCase):
+    """GCRA token bucket and daily quota of menuapp.ratelimit, on a controlled clock."""
+
+    def setUp(self):
+        ratelimit.reset_limits()
+        self.addCleanup(ratelimit.reset_limits)
+        self.now = 1_000_000.0
+
+    def app(self, rate=None, burst=None, quota=None):
+        return AppKey(1, "Tests", rate, burst, quota)
+
+    def check(self, app, at=0.0):
+        with mock.patch.object(ratelimit.time, "time", return_value=self.now + at):
+            return ratelimit.check_request(app)
+
+    def test_limits_for(self):
+        self.assertEqual(ratelimit.limits_for(self.app()), (120, 30, None))
+        self.assertEqual(ratelimit.limits_for(self.app(rate=0, burst=0, quota=0)), (None, 1, None))
+        self.assertEqual(ratelimit.limits_for(self.app(rate=10, burst=5, quota=100)), (10, 5, 100))
+        with self.settings(RATE_LIMIT_DAILY_QUOTA=1000):
+            self.assertEqual(ratelimit.limits_for(self.app())[2], 1000)
+            self.assertIsNone(ratelimit.limits_for(self.app(quota=0))[2])
+
+    def test_burst_then_refill(self):
+        app = self.app(rate=60, burst=3)  # one token a second
+        remaining = [self.check(app)[1]["X-RateLimit-Remaining"] for _ in range(3)]
+        self.assertEqual(remaining, ["2", "1", "0"])
+
+        allowed, headers = self.check(app)
+        self.assertFalse(allowed)
+        self.assertEqual(headers["Retry-After"], "1")
+
+        self.assertFalse(self.check(app, at=0.5)[0])
+        self.assertTrue(self.check(app, at=1.0)[0])
+        self.assertFalse(self.check(app, at=1.0)[0])
+        # Idle long enough to refill completely, but never beyond the burst
+        self.assertEqual([self.check(app, at=100)[0] for _ in range(4)], [True, True, True, False])
+
+    def test_retry_after_rounds_up(self):
+        app = self.app(rate=20, burst=1)  # a token every 3 seconds
+        self.assertTrue(self.check(app)[0])
+        allowed, headers = self.check(app, at=0.5)
+        self.assertFalse(allowed)
+        self.assertEqual(headers["Retry-After"], "3")
+
+    def test_unlimited_rate(self):
+        app = self.app(rate=0)
+        for _ in range(500):
+            allowed, headers = self.check(app)
+            self.assertTrue(allowed)
+        self.assertNotIn("X-RateLimit-Limit", headers)
+
+    def test_daily_quota_rolls_over(self):
+        app = self.app(rate=0, quota=2)
+        tz = timezone.get_current_timezone()
+        late = datetime(2026, 3, 1, 23, 59, 30, tzinfo=tz)
+
+        def at(moment):
+            return mock.patch.multiple(ratelimit.timezone, now=lambda: moment, localdate=lambda: moment.date())
+
+        with at(late):
+            self.assertTrue(self.check(app)[0])
+            allowed, headers = self.check(app)
+            self.assertTrue(allowed)
+            self.assertEqual(headers["X-Quota-Remaining"], "0")
+            allowed, headers = self.check(app)
+            self.assertFalse(allowed)
+            self.assertEqual(headers["Retry-After"], "30")
+        with at(late + timedelta(minutes=1)):
+            allowed, headers = self.check(app)
+            self.assertTrue(allowed)
+            self.assertEqual(headers["X-Quota-Remaining"], "1")
+
+
+class BuildImageVariantsTests(TestCase):
+    def test_bumps_versions_of_affected_hotels(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            seaside, harbour = Hotel.objects.create(name="Seaside"), Hotel.objects.create(name="Harbour")
+            MenuItem.objects.create(hotel=seaside, item_name="Pancakes", image_local="images/ab/abc.jpg")
+            MenuItem.objects.create(hotel=harbour, item_name="Soup")
+        keys = [MenuVersion.hotel_key(seaside.pk), MenuVersion.hotel_key(harbour.pk)]
+        before = {key: stamp.version for key, stamp in MenuVersion.stamps(keys).items()}
+        sizes = {"thumbnail": {"width": 200, "src": "images/ab/abc-thumbnail.jpg", "webp": "images/ab/abc-thumbnail.webp"}}
+
+        with mock.patch("menuapp.management.commands.build_image_variants.build_variants_many",
+                        return_value={"images/ab/abc.jpg": sizes}), \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command("build_image_variants", stdout=io.StringIO())
+
+        after = {key: stamp.version for key, stamp in MenuVersion.stamps(keys).items()}
+        self.assertEqual(after, {keys[0]: before[keys[0]] + 1, keys[1]: before[keys[1]]})
+        self.assertEqual(MenuItem.objects.get(item_name="Pancakes").image_variants, sizes)
+
+
+class MenusByHotelTests(TestCase):
+    def test_groups_items_like_single_menus(self):
+        seaside, harbour, empty = (Hotel.objects.create(name=name) for name in ("Seaside", "Harbour", "Empty"))
+        for hotel, names in ((seaside, ["Pancakes", "Soup"]), (harbour, ["Tea"])):
+            for name in names:
+                MenuItem.objects.create(hotel=hotel, item_name=name)
+        MenuItem.objects.create(hotel=seaside, item_name="Hidden", is_visible=False)
+
+        menus = menus_by_hotel([seaside.pk, harbour.pk, empty.pk])
+
+        for hotel in (seaside, harbour, empty):
+            expected = serialize_menu_items(hotel.menu_items.filter(is_visible=True).order_by("pk"))
+            self.assertEqual(menus[hotel.pk], expected)
+
+
+class BulkDeleteTests(TestCase):
+    def setUp(self):
+        invalidate_api_keys()
+        self.key = AllowedApp.objects.create(app_name="Tests", rate_per_minute=0).api_key
+        self.client.force_login(User.objects.create_user("staff"))
+        hotel = Hotel.objects.create(name="Seaside")
+        self.items = [MenuItem.objects.create(hotel=hotel, item_name=f"Dish {n}") for n in range(3)]
+
+    def post(self, data):
+        return self.client.post("/api/menu/bulk_delete/", data, content_type="application/json", HTTP_X_APP_KEY=self.key)
+
+    def test_ids_must_be_a_list(self):
+        for ids in ("12", f"{self.items[0].pk}", 5, {"a": 1}, ["x"]):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.post({"ids": ids}).status_code, 400)
+        self.assertEqual(MenuItem.objects.count(), 3)
+
+    def test_deletes_listed_items(self):
+        response = self.post({"ids": [self.items[0].pk, self.items[1].pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["deleted"], 2)
+        self.assertEqual(list(MenuItem.objects.values_list("pk", flat=True)), [self.items[2].pk])
+
+
+class SetBasedDeletionTests(TestCase):
+    def test_relations_are_all_handled(self):
+        # Fails when a new FK/M2M points at MenuItem or Hotel: menuapp.deletion must clean it up first
+        for model in (MenuItem, Hotel):
+            check_relations(model)
+
+    def test_unknown_relation_is_refused(self):
+        with mock.patch.dict(HANDLED_RELATIONS, {MenuItem: {"categories"}}):
+            with self.assertRaises(RuntimeError):
+                delete_menu_items([1])
+
+    def test_delete_hotels(self):
+        hotel = Hotel.objects.create(name="Seaside")
+        item = MenuItem.objects.create(hotel=hotel, item_name="Pancakes")
+        item.categories.add(Category.objects.create(name="Breakfast"))
+        result = delete_hotels([hotel.pk])
+        self.assertEqual((result["hotels"], result["items"]), (1, 1))
+        self.assertFalse(MenuItem.categories.through.objects.exists())
+        self.assertEqual(
+            set(Tombstone.objects.values_list("kind", "object_id")),
+            {(Tombstone.KIND_HOTEL, hotel.pk), (Tombstone.KIND_ITEM, item.pk)},
+        )
+
+
+class MenuResponseCacheTests(TestCase):
+    def setUp(self):
+        invalidate_api_keys()
+        menu_cache().clear()
+        self.key = AllowedApp.objects.create(app_name="Tests", rate_per_minute=0).api_key
+        self.hotel = Hotel.objects.create(name="Seaside")
+        MenuItem.objects.create(hotel=self.hotel, item_name="Pancakes", image_local="images/ab/abc.jpg")
+
+    def get(self, **extra):
+        return self.client.get(f"/api/hotel/{self.hotel.pk}/menu/", HTTP_X_APP_KEY=self.key, **extra)
+
+    def test_scheme_is_part_of_the_key(self):
+        http = self.get()
+        self.assertEqual(http["X-Cache"], "MISS")
+        self.assertEqual(self.get()["X-Cache"], "HIT")
+
+        https = self.get(secure=True)
+        self.assertEqual(https["X-Cache"], "MISS")
+        self.assertTrue(https.json()["menu"][0]["image"].startswith("https://"))
+        self.assertTrue(http.json()["menu"][0]["image"].startswith("http://"))
+
+
+class SeededOrderTests(TestCase):
+    """SeededOrder is a permutation fixed by its seed, and /api/menu/all/ pages through it without gaps."""
+
+    def setUp(self):
+        invalidate_api_keys()
+        menu_cache().clear()
+        unified._snapshots.clear()
+        self.key = AllowedApp.objects.create(app_name="Tests", rate_per_minute=0).api_key
+
+    def test_permutation(self):
+        for size in (0, 1, 2, 3, 15, 16, 17, 100, 257):
+            for seed in (0, 1, 12345, 2 ** 63 - 1):
+                with self.subTest(size=size, seed=seed):
+                    order = SeededOrder(list(range(size)), seed)
+                    self.assertEqual(sorted(order), list(range(size)))
+
+    def test_seed_fixes_the_order(self):
+        entries = list(range(50))
+        self.assertEqual(list(SeededOrder(entries, 7)), list(SeededOrder(entries, 7)))
+        self.assertNotEqual(list(SeededOrder(entries, 7)), list(SeededOrder(entries, 8)))
+
+    def test_slices_match_indexes(self):
+        order = SeededOrder(list(range(40)), 99)
+        whole = [order[i] for i in range(len(order))]
+        self.assertEqual(order[15:30], whole[15:30])
+        self.assertEqual(order[35:100], whole[35:])
+        self.assertEqual(order[-1], whole[-1])
+        with self.assertRaises(IndexError):
+            order[40]
+
+    def test_paging_is_stable_per_seed(self):
+        hotel = Hotel.objects.create(name="Seaside")
+        for n in range(40):
+            MenuItem.objects.create(hotel=hotel, item_name=f"Dish {n:02}")
+
+        first = self.client.get("/api/menu/all/", HTTP_X_APP_KEY=self.key).json()
+        seed, names, page = first["seed"], [], first
+        while True:
+            names += [entry["item_name"] for entry in page["results"]]
+            if not page["next"]:
+                break
+            self.assertEqual(parse_qs(urlsplit(page["next"]).query)["seed"], [str(seed)])
+            page = self.client.get(page["next"], HTTP_X_APP_KEY=self.key).json()
+        self.assertEqual(sorted(names), [f"Dish {n:02}" for n in range(40)])
+
+        again = self.client.get("/api/menu/all/", {"seed": seed}, HTTP_X_APP_KEY=self.key).json()
+        self.assertEqual([entry["item_name"] for entry in again["results"]], names[:15])
+
+    def test_invalid_seed(self):
+        for seed in ("abc", "-1", str(2 ** 63)):
+            with self.subTest(seed=seed):
+                response = self.client.get("/api/menu/all/", {"seed": seed}, HTTP_X_APP_KEY=self.key)
+                self.assertEqual(response.status_code, 400)
+
+
+class ConditionalMenuTests(TestCase):
+    """ETag / Last-Modified of /api/hotel/<id>/menu/ change with that hotel's version and the categories one only."""
+
+    def setUp(self):
+        invalidate_api_keys()
+        menu_cache().clear()
+        self.key = AllowedApp.objects.create(app_name="Tests", rate_per_minute=0).api_key
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hotel = Hotel.objects.create(name="Seaside")
+            self.other = Hotel.objects.create(name="Harbour")
+            self.item = MenuItem.objects.create(hotel=self.hotel, item_name="Pancakes")
+            MenuItem.objects.create(hotel=self.other, item_name="Waffles")
+        # Last-Modified has one-second resolution; start well in the past
+        MenuVersion.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def get(self, **extra):
+        return self.client.get(f"/api/hotel/{self.hotel.pk}/menu/", HTTP_X_APP_KEY=self.key, **extra)
+
+    def change(self, item):
+        with self.captureOnCommitCallbacks(execute=True):
+            item.description = "Changed"
+            item.save()
+
+    def assertStatuses(self, validators, expected):
+        for name, headers in validators.items():
+            with self.subTest(name):
+                self.assertEqual(self.get(**headers).status_code, expected)
+
+    def validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        return {
+            "etag": {"HTTP_IF_NONE_MATCH": response["ETag"]},
+            "last_modified": {"HTTP_IF_MODIFIED_SINCE": response["Last-Modified"]},
+        }
+
+    def test_unchanged_is_not_modified(self):
+        self.assertStatuses(self.validators(), 304)
+
+    def test_other_hotel_change_keeps_validators(self):
+        validators = self.validators()
+        self.change(MenuItem.objects.get(hotel=self.other))
+        self.assertStatuses(validators, 304)
+
+    def test_own_change_invalidates(self):
+        validators = self.validators()
+        self.change(self.item)
+        self.assertStatuses(validators, 200)
+
+    def test_category_change_invalidates(self):
+        validators = self.validators()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Breakfast")
+        self.assertStatuses(validators, 200)
+
+    def test_etag_depends_on_accept(self):
+        etag = self.get()["ETag"]
+        response = self.get(HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class SyncTests(TestCase):
+    """/api/sync/ tokens return only what changed since, with deleted and hidden items as ids to drop."""
+
+    def setUp(self):
+        invalidate_api_keys()
+        self.key = AllowedApp.objects.create(app_name="Tests", rate_per_minute=0).api_key
+        self.hotel = Hotel.objects.create(name="Seaside")
+        self.other = Hotel.objects.create(name="Harbour")
+        self.pancakes = MenuItem.objects.create(hotel=self.hotel, item_name="Pancakes")
+        self.waffles = MenuItem.objects.create(hotel=self.hotel, item_name="Waffles")
+        self.soup = MenuItem.objects.create(hotel=self.other, item_name="Soup")
+
+    def sync(self, **params):
+        response = self.client.get("/api/sync/", params, HTTP_X_APP_KEY=self.key)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_sync(self):
+        data = self.sync()
+        self.assertTrue(data["reset"])
+        self.assertEqual(
+            {(item["id"], item["hotel_id"]) for item in data["items"]},
+            {(self.pancakes.pk, self.hotel.pk), (self.waffles.pk, self.hotel.pk), (self.soup.pk, self.other.pk)},
+        )
+        self.assertEqual(len(data["hotels"]), 2)
+
+    def test_delta(self):
+        token = self.sync()["token"]
+        self.assertEqual(self.sync(since=token)["items"], [])
+
+        self.pancakes.description = "Fluffy"
+        self.pancakes.save()
+        self.waffles.is_visible = False
+        self.waffles.save()
+        soup_pk = self.soup.pk
+        self.soup.delete()
+        category = Category.objects.create(name="Breakfast")
+
+        data = self.sync(since=token)
+        self.assertFalse(data["reset"])
+        self.assertEqual([item["id"] for item in data["items"]], [self.pancakes.pk])
+        self.assertEqual(sorted(data["deleted"]["items"]), sorted([self.waffles.pk, soup_pk]))
+        self.assertEqual([c["id"] for c in data["categories"]], [category.pk])
+        self.assertEqual(data["hotels"], [])
+
+        later = self.sync(since=data["token"])
+        self.assertEqual((later["items"], later["deleted"]["items"], later["categories"]), ([], [], []))
+
+    def test_hotel_filter(self):
+        token = self.sync()["token"]
+        item_pk, hotel_pk = self.waffles.pk, self.other.pk
+        self.waffles.delete()
+        delete_hotels([hotel_pk])
+
+        data = self.sync(since=token, hotel=self.hotel.pk)
+        self.assertEqual(data["deleted"]["items"], [item_pk])
+        self.assertEqual(data["deleted"]["hotels"], [])
+        self.assertEqual(self.sync(since=token, hotel=hotel_pk)["deleted"]["hotels"], [hotel_pk])
+
+    @override_settings(SYNC_TOMBSTONE_DAYS=30)
+    def test_token_older_than_tombstones_resets(self):
+        token = make_token(timezone.now() - timedelta(days=31))
+        self.soup.delete()
+
+        data = self.sync(since=token)
+        self.assertTrue(data["reset"])
+        self.assertEqual(len(data["items"]), 2)
+        self.assertEqual(data["deleted"]["items"], [])
+
+    @override_settings(SYNC_OVERLAP_SECONDS=60)
+    def test_token_overlaps_recent_changes(self):
+        data = self.sync(since=self.sync()["token"])
+        self.assertEqual(len(data["items"]), 3)
+
+    def test_invalid_parameters(self):
+        for params in ({"since": "yesterday"}, {"since": "9" * 30}, {"hotel": "x"}):
+            with self.subTest(params=params):
+                response = self.client.get("/api/sync/", params, HTTP_X_APP_KEY=self.key)
+                self.assertEqual(response.status_code, 400)
+
+
+class BatchEditTests(TestCase):
+    """Batch edits are validated up front and applied all or nothing."""
+
+    def setUp(self):
+        invalidate_api_keys()
+        self.key = AllowedApp.objects.create(app_name="Tests", rate_per_minute=0).api_key
+        self.client.force_login(User.objects.create_user("staff"))
+        hotel = Hotel.objects.create(name="Seaside")
+        self.items = [MenuItem.objects.create(hotel=hotel, item_name=f"Dish {n}") for n in range(3)]
+        self.ids = [item.pk for item in self.items]
+        self.breakfast = Category.objects.create(name="Breakfast")
+        self.lunch = Category.objects.create(name="Lunch")
+        self.items[0].categories.add(self.breakfast)
+
+    def state(self):
+        return (
+            sorted(MenuItem.objects.values_list("pk", "is_visible")),
+            sorted(MenuItem.categories.through.objects.values_list("menuitem_id", "category_id")),
+            list(Tombstone.objects.values_list("object_id", flat=True)),
+        )
+
+    def test_parse_errors(self):
+        for ops, message in (
+            ([], "ops must be a non-empty list."),
+            ({"op": "delete", "ids": [1]}, "ops must be a non-empty list."),
+            (["delete"], "ops[0]: must be an object."),
+            ([{"op": "delete", "ids": [1]}, {"op": "rename", "ids": [1]}], "ops[1]: op must be"),
+            ([{"op": "delete", "ids": "1"}], "ops[0]: ids must be a list"),
+            ([{"op": "visibility", "ids": [1], "visible": "no"}], "ops[0]: visible must be"),
+            ([{"op": "categories", "ids": [1], "type": "other"}], "ops[0]: type must be"),
+            ([{"op": "categories", "ids": [1], "type": "auto", "category_ids": [self.lunch.pk, 999]}],
+             "ops[0]: unknown category ids [999]."),
+        ):
+            with self.subTest(ops=ops):
+                with self.assertRaisesMessage(ValueError, message):
+                    parse_ops(ops)
+
+    def test_apply(self):
+        results = apply_menu_edits(parse_ops([
+            {"op": "visibility", "ids": [self.ids[0], self.ids[1], 999], "visible": False},
+            {"op": "categories", "ids": [self.ids[0], self.ids[2]], "type": "auto", "category_ids": [self.lunch.pk]},
+            {"op": "delete", "ids": [self.ids[1]]},
+            {"op": "visibility", "ids": [self.ids[1]], "visible": True},
+        ]))
+        self.assertEqual(results[0], {"op": "visibility", "matched": 2, "changed": 2, "missing": [999]})
+        self.assertEqual(results[1], {"op": "categories", "matched": 2, "added": 2, "removed": 1, "missing": []})
+        self.assertEqual(results[2]["deleted"], 1)
+        self.assertEqual(results[3]["missing"], [self.ids[1]])
+        self.assertEqual(self.state(), (
+            [(self.ids[0], False), (self.ids[2], True)],
+            [(self.ids[0], self.lunch.pk), (self.ids[2], self.lunch.pk)],
+            [self.ids[1]],
+        ))
+        self.assertEqual(search("lunch"), [self.ids[2]])
+
+    def test_failing_op_rolls_back_the_batch(self):
+        before = self.state()
+        ops = parse_ops([
+            {"op": "visibility", "ids": self.ids, "visible": False},
+            {"op": "categories", "ids": self.ids, "type": "auto", "category_ids": [self.lunch.pk]},
+            {"op": "delete", "ids": self.ids[:1]},
+        ])
+        versions = dict(MenuVersion.objects.values_list("key", "version"))
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch("menuapp.edits.delete_items", side_effect=RuntimeError("boom")):
+                with self.assertRaises(RuntimeError):
+                    apply_menu_edits(ops)
+        self.assertEqual(self.state(), before)
+        self.assertEqual(search("lunch"), [])
+        self.assertEqual(dict(MenuVersion.objects.values_list("key", "version")), versions)
+
+    def test_invalid_op_applies_nothing(self):
+        before = self.state()
+        response = self.client.post(
+            "/api/menu/batch/",
+            {"ops": [{"op": "visibility", "ids": self.ids, "visible": False}, {"op": "delete", "ids": "all"}]},
+            content_type="application/json",
+            HTTP_X_APP_KEY=self.key,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "ops[1]: ids must be a list of integers.")
+        self.assertEqual(self.state(), before)
@@ -0,0 +1,159 @@
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from itertools import groupby
+
+from django.db.models import Q
+
+from .models import MenuItem, MenuVersion
+from .serializers import image_sizes
+
+# Snapshots kept per process: one per (menu version, active category set)
+MAX_SNAPSHOTS = 8
+
+_snapshots = OrderedDict()
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def build_snapshot(active_categories) -> list:
+    """
+    The full unified menu for a set of active manual category ids: visible items
+    grouped across hotels by normalized name, in that order. Items with manual
+    categories only appear while one of them is active; uncategorized items
+    always do. URLs are kept relative so the snapshot is request-independent.
+    """
+    items = (
+        MenuItem.objects.filter(is_visible=True)
+        .select_related("hotel")
+        .prefetch_related("manual_categories")
+    )
+    if active_categories:
+        items = items.filter(
+            Q(manual_categories__in=active_categories) | Q(manual_categories__isnull=True)
+        ).distinct()
+    else:
+        # If somehow no active categories are found, show all visible items
+        items = items.distinct()
+
+    # The DB sorts by the indexed normalized_name, so each group is one consecutive run
+    entries = []
+    for _, group in groupby(items.order_by("normalized_name", "pk"), key=lambda item: item.normalized_name):
+        menu_list = list(group)
+        first_item = menu_list[0]
+        entries.append({
+            "item_name": first_item.item_name,
+            "price": f"{float(first_item.price):.3f} KD" if first_item.price else None,
+            "description": first_item.description,
+            "image": f"/media/{first_item.image_local}" if first_item.image_local else (first_item.image_url or None),
+            "image_sizes": image_sizes(first_item.image_variants),
+            "manual_categories": [cat.name for cat in first_item.manual_categories.all()],
+            "hotels": [
+                {"hotel_name": m.hotel.name, "hotel_logo": m.hotel.logo.url if m.hotel.logo else None}
+                for m in menu_list
+            ],
+        })
+
+    return entries
+
+
+def unified_snapshot(active_categories, version=None) -> list:
+    """
+    Precomputed unified menu for the current MenuVersion. Built once per
+    version and category set, then shared by every request until menu data
+    changes (menuapp.signals bumps the version). Treat the result as read-only.
+    """
+    if version is None:
+        version = MenuVersion.current().version
+    key = (version, frozenset(active_categories))
+
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            _snapshots.move_to_end(key)
+            return snapshot
+
+    # One build at a time; concurrent requests for the same key wait and reuse it
+    with _build_lock:
+        with _lock:
+            snapshot = _snapshots.get(key)
+        if snapshot is None:
+            snapshot = build_snapshot(active_categories)
+            with _lock:
+                for old in [k for k in _snapshots if k[0] < version]:
+                    del _snapshots[old]
+                _snapshots[key] = snapshot
+                while len(_snapshots) > MAX_SNAPSHOTS:
+                    _snapshots.popitem(last=False)
+    return snapshot
+
+
+def new_seed() -> int:
+    return secrets.randbits(32)
+
+
+class SeededOrder(Sequence):
+    """
+    `entries` in a pseudo-random order fixed by `seed`. Position i maps to a
+    unique entry through a keyed Feistel permutation (cycle-walked into
+    range), so any slice is computed without shuffling the whole list and
+    the same seed always gives the same order for the same snapshot.
+    """
+    ROUNDS = 4
+
+    def __init__(self, entries, seed: int):
+        self.entries = entries
+        self.seed = seed
+        self._key = seed.to_bytes(8, "big")
+        self._half_bits = max(1, ((len(entries) - 1).bit_length() + 1) // 2)
+        self._mask = (1 << self._half_bits) - 1
+
+    def _round(self, r, value):
+        digest = hashlib.blake2b(value.to_bytes(8, "big"), digest_size=8, key=self._key, salt=r.to_bytes(16, "big"))
+        return int.from_bytes(digest.digest(), "big") & self._mask
+
+    def position(self, index: int) -> int:
+        """Index into `entries` shown at `index`."""
+        value = index
+        while True:
+            left, right = value >> self._half_bits, value & self._mask
+            for r in range(self.ROUNDS):
+                left, right = right, left ^ self._round(r, right)
+            value = (left << self._half_bits) | right
+            # The permutation covers up to 4x the list size; walk until back in range
+            if value < len(self.entries):
+                return value
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.entries[self.position(i)] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.entries[self.position(index)]
+
+
+def present(entry: dict, request) -> dict:
+    """One snapshot entry as returned by the API, with absolute URLs."""
+    return {
+        **entry,
+        "image": request.build_absolute_uri(entry["image"]) if entry["image"] else None,
+        "image_sizes": {
+            size: {
+                **variant,
+                "url": request.build_absolute_uri(variant["url"]),
+                "webp": request.build_absolute_uri(variant["webp"]),
+            }
+            for size, variant in entry["image_sizes"].items()
+        },
+        "hotels": [
+            {**hotel, "hotel_logo": request.build_absolute_uri(hotel["hotel_logo"]) if hotel["hotel_logo"] else None}
+            for hotel in entry["hotels"]
+        ],
+    }
@@ -50,12 +50,19 @@ urlpatterns = [
     path("api-token-auth/", obtain_auth_token, name="api_token_auth"),
     path("api/menu/all/", views.UnifiedMenuAPI.as_view(), name="unified_menu_api"),
     path("api/upload-menu/", views.UploadMenuAPI.as_view(), name="api_upload"),
+    path("api/import-jobs/<int:pk>/", views.ImportJobStatusAPI.as_view(), name="api_import_job"),
+    path("api/cache-stats/", views.MenuCacheStatsAPI.as_view(), name="api_cache_stats"),
     path("api/hotels/", views.HotelListAPI.as_view(), name="api_hotels"),
+    path("api/hotels/menus/", views.HotelMenusAPI.as_view(), name="api_hotel_menus"),
     path("api/hotel/<int:pk>/menu/", views.HotelMenuAPI.as_view(), name="api_hotel_menu"),
+    path("api/menu/items/", views.MenuAllAPI.as_view(), name="api_menu_items"),
     path("api/menu/random/", views.MenuRandomAPI.as_view(), name="api_random_menu"),
+    path("api/menu/search/", views.MenuSearchAPI.as_view(), name="api_menu_search"),
+    path("api/sync/", views.SyncAPI.as_view(), name="api_sync"),
     path("api/menu/<int:pk>/update_category/", views.UpdateMenuCategoryAPI.as_view(), name="update_menu_category"),
     
     path("api/menu/<int:pk>/delete/", views.DeleteMenuItemAPI.as_view(), name="delete_menu_item"),
+    path("api/menu/batch/", views.BatchMenuEditAPI.as_view(), name="batch_menu_edit"),
     path("api/menu/bulk_delete/", views.BulkDeleteMenuItemsAPI.as_view(), name="bulk_delete_menu_items"),
     path("api/hotel/<int:pk>/delete/", views.DeleteHotelAPI.as_view(), name="delete_hotel"),
     # path("api/menu/all/", views.MenuAllAPI.as_view(), name="api_all_menu"),
@@ -1,61 +1,218 @@
-import os
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from itertools import zip_longest
+from urllib.parse import urlsplit
+
 import requests
-from slugify import slugify
 from django.conf import settings
+from django.utils import timezone
+
+from .models import ImageFetch
+from .storage import content_store
+
+# Outcome of one image request, applied to the ImageFetch cache by the calling thread
+FetchResult = namedtuple("FetchResult", "url path etag last_modified error")
+
 
 def download_image(url: str, hotel_name: str) -> str:
     """
-    Download image from URL and store it under media/menu_images/<hotel>/
+    Download image from URL into the content-addressed store (menuapp.storage).
+    Identical images are stored once whichever hotel uses them; `hotel_name`
+    only labels log lines. Goes through the same fetch cache as fetch_images().
     Returns relative path, or None if failed.
     """
     if not url:
         return None
+    return fetch_images([url], hotel_name).get(url)
+
+
+def _request_image(url: str, hotel_name: str, cached=None) -> FetchResult:
+    """
+    GET one image, revalidating with If-None-Match/If-Modified-Since when we
+    already hold a copy. A 304 keeps the cached file without reading a body.
+    Touches only the network and the file store, never the DB (runs in pool threads).
+    """
+    # Send headers to avoid 403/blocked requests
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+    }
+    have_copy = bool(cached and cached.local_path and content_store.exists(cached.local_path))
+    if have_copy:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
 
     try:
-        # Send headers to avoid 403/blocked requests
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-        }
-        response = requests.get(url, headers=headers, stream=True, timeout=15, allow_redirects=True)
+        response = requests.get(url, headers=headers, stream=True, timeout=getattr(settings, "IMAGE_FETCH_TIMEOUT", 15), allow_redirects=True)
+        if response.status_code == 304 and have_copy:
+            response.close()
+            content_store.touch(cached.local_path)
+            return FetchResult(url, cached.local_path, cached.etag, cached.last_modified, None)
         response.raise_for_status()
     except Exception as e:
-        print(f"[Image Download Error] URL: {url} | Error: {e}")
-        return None
+        print(f"[Image Download Error] {hotel_name} | URL: {url} | Error: {e}")
+        return FetchResult(url, None, "", "", str(e))
 
     # Check content type
     content_type = response.headers.get("Content-Type", "").lower()
     if "image" not in content_type:
-        print(f"[Invalid Image Content] URL: {url} | Content-Type: {content_type}")
-        return None
-
-    # Determine file extension
-    if "jpeg" in content_type or "jpg" in content_type:
-        ext = "jpg"
-    elif "png" in content_type:
-        ext = "png"
-    elif "gif" in content_type:
-        ext = "gif"
-    else:
-        ext = "jpg"  # default fallback
-
-    # Prepare folder
-    hotel_slug = slugify(hotel_name)
-    dest_dir = os.path.join(settings.MEDIA_ROOT, "menu_images", hotel_slug)
-    os.makedirs(dest_dir, exist_ok=True)
-
-    # Create safe filename
-    base_name = slugify(url.split("/")[-1]) or slugify(hotel_name)
-    file_name = f"{base_name}.{ext}"
-    file_path = os.path.join(dest_dir, file_name)
+        response.close()
+        print(f"[Invalid Image Content] {hotel_name} | URL: {url} | Content-Type: {content_type}")
+        return FetchResult(url, None, "", "", f"Not an image: {content_type}")
 
     try:
-        with open(file_path, "wb") as img_file:
-            for chunk in response.iter_content(chunk_size=1024):
-                img_file.write(chunk)
+        path = content_store.store(response.iter_content(chunk_size=64 * 1024), image_extension(content_type))
     except Exception as e:
-        print(f"[Save Image Error] URL: {url} | Error: {e}")
-        return None
+        print(f"[Save Image Error] {hotel_name} | URL: {url} | Error: {e}")
+        return FetchResult(url, None, "", "", str(e))
+
+    return FetchResult(
+        url,
+        path,
+        response.headers.get("ETag", ""),
+        response.headers.get("Last-Modified", ""),
+        None,
+    )
+
+
+def image_extension(content_type: str) -> str:
+    """File extension for an image Content-Type."""
+    if "jpeg" in content_type or "jpg" in content_type:
+        return "jpg"
+    if "png" in content_type:
+        return "png"
+    if "gif" in content_type:
+        return "gif"
+    if "webp" in content_type:
+        return "webp"
+    return "jpg"  # default fallback
+
+
+def url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _last_good_copy(cached):
+    if cached and cached.local_path and content_store.touch(cached.local_path):
+        return cached.local_path
+    return None
+
+
+def _load_fetch_cache(urls) -> dict:
+    """{url: ImageFetch} for the URLs we've requested before."""
+    hashes = [url_hash(u) for u in urls]
+    cache = {}
+    for start in range(0, len(hashes), 500):
+        for entry in ImageFetch.objects.filter(url_hash__in=hashes[start:start + 500]):
+            cache[entry.url] = entry
+    return cache
+
+
+def _save_fetch_cache(results, cache):
+    """Upsert the validators / failure window learned from this round of requests."""
+    now = timezone.now()
+    negative_ttl = timedelta(seconds=getattr(settings, "IMAGE_FETCH_NEGATIVE_TTL", 3600))
+    rows = []
+    for result in results:
+        cached = cache.get(result.url)
+        if result.error:
+            rows.append(ImageFetch(
+                url_hash=url_hash(result.url),
+                url=result.url,
+                # Keep the last good copy; it is still served while the URL is failing
+                local_path=cached.local_path if cached else "",
+                etag=cached.etag if cached else "",
+                last_modified=cached.last_modified if cached else "",
+                failed_until=now + negative_ttl,
+                error=result.error[:255],
+                fetched_at=now,
+            ))
+        else:
+            rows.append(ImageFetch(
+                url_hash=url_hash(result.url),
+                url=result.url,
+                local_path=result.path,
+                etag=result.etag[:255],
+                last_modified=result.last_modified[:64],
+                failed_until=None,
+                error="",
+                fetched_at=now,
+            ))
+    if rows:
+        ImageFetch.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["url_hash"],
+            update_fields=["local_path", "etag", "last_modified", "failed_until", "error", "fetched_at"],
+        )
+
+
+def fetch_images(urls, hotel_name: str, max_workers: int = None, per_host: int = None, on_done=None) -> dict:
+    """
+    Download many images concurrently through a bounded worker pool.
+
+    At most `max_workers` downloads run at the same time overall, and at most
+    `per_host` of them against any single host, so one slow image server
+    cannot hold every worker. Duplicate URLs are fetched once.
+
+    Requests go through the ImageFetch cache: images we already hold are
+    revalidated with conditional requests (304 = no body), and URLs that
+    failed within IMAGE_FETCH_NEGATIVE_TTL are not requested again.
+    `on_done(done, total)` is called from the calling thread after each URL.
+    Returns {url: relative path or None}.
+    """
+    max_workers = max_workers or getattr(settings, "IMAGE_FETCH_MAX_WORKERS", 16)
+    per_host = per_host or getattr(settings, "IMAGE_FETCH_PER_HOST", 4)
+
+    unique = list(dict.fromkeys(u for u in urls if u))
+    if not unique:
+        return {}
+    cache = _load_fetch_cache(unique)
+
+    results = {}
+    now = timezone.now()
+    by_host = {}
+    for url in unique:
+        cached = cache.get(url)
+        if cached and cached.failed_until and cached.failed_until > now:
+            # Known-bad URL: don't wait on it again, fall back to the last good copy
+            results[url] = _last_good_copy(cached)
+            continue
+        by_host.setdefault(urlsplit(url).netloc.lower(), []).append(url)
+
+    if on_done and results:
+        on_done(len(results), len(unique))
+    if not by_host:
+        return results
+
+    host_slots = {host: threading.BoundedSemaphore(per_host) for host in by_host}
+
+    def fetch(url):
+        with host_slots[urlsplit(url).netloc.lower()]:
+            return _request_image(url, hotel_name, cache.get(url))
+
+    # Interleave hosts so queued work for one host doesn't block the others
+    queue = [url for batch in zip_longest(*by_host.values()) for url in batch if url]
+
+    fetched = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(queue))) as pool:
+        futures = {pool.submit(fetch, url): url for url in queue}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[Image Download Error] URL: {url} | Error: {e}")
+                result = FetchResult(url, None, "", "", str(e))
+            fetched.append(result)
+            results[url] = result.path if not result.error else _last_good_copy(cache.get(url))
+            if on_done:
+                on_done(len(results), len(unique))
 
-    # Return relative path for MEDIA_URL serving
-    rel_path = os.path.relpath(file_path, settings.MEDIA_ROOT)
-    return rel_path.replace("\\", "/")
\ No newline at end of file
+    _save_fetch_cache(fetched, cache)
+    return results
@@ -1,41 +1,47 @@
-import math
-import os
+import base64
+import binascii
+import json
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db import transaction
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import generics, views, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.decorators import api_view, authentication_classes, permission_classes
-from rest_framework.authtoken.models import Token
 from django.contrib import messages
 from .forms import HotelForm
 from .forms import MenuItemForm
-from .models import Category, Hotel, ManualCategory, MenuItem
-from .serializers import HotelSerializer, HotelDetailSerializer, MenuItemSerializer
-from django.db.models import Q
+from .models import Category, Hotel, ImportJob, ManualCategory, MenuItem, MenuVersion
+from .serializers import HotelSerializer, HotelDetailSerializer, ImportJobSerializer, MenuItemSerializer, menus_by_hotel, serialize_menu_items
+from django.db.models import IntegerField, Q
 from .utils import download_image
-import pandas as pd
-from openpyxl import load_workbook
-import openpyxl
+from .storage import CONTENT_PREFIX, delete_unreferenced_files
+from .deletion import delete_hotels, delete_menu_items
+from .edits import apply_menu_edits, parse_ops
+from .imaging import refresh_item_variants
+from .importer import hotel_name_from_filename
+from .conditional import MenuVersionConditionalMixin
+from .renderers import FastJSONRenderer
+from .response_cache import CachedMenuResponseMixin, cache_stats, reset_cache_stats
+from .sampling import sample_items
+from .search import SearchResults
+from .sync import changes_since, parse_token
+from .schedule import active_categories, active_window
+from .unified import SeededOrder, new_seed, present, unified_snapshot
 from collections import defaultdict
-from slugify import slugify
 from django.contrib.auth import authenticate, login, logout
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import BasePagination
+from rest_framework.exceptions import NotFound
 from django.db.models import Count
-from random import sample
-import random
-from datetime import datetime, time
-import pytz
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+from django.views.static import serve
 from rest_framework.generics import ListAPIView
 # sudo systemctl restart gunicorn
 # sudo systemctl reload nginx
@@ -59,7 +65,8 @@ def logout_view(request):
 @login_required
 def dashboard_view(request):
     hotels = Hotel.objects.all().order_by('-uploaded_at')
-    return render(request, "dashboard.html", {"hotels": hotels})
+    import_jobs = ImportJob.objects.all()[:10]
+    return render(request, "dashboard.html", {"hotels": hotels, "import_jobs": import_jobs})
 
 def hotel_list_view(request):
     """List all hotels uploaded."""
@@ -85,7 +92,7 @@ def hotel_menu_view(request, pk):
 
 @login_required
 def upload_xlsx_view(request):
-    """Upload .xlsx file and import data into DB (supports _shortDescEn and _hotelLogo)."""
+    """Upload .xlsx file and queue it for import (supports _shortDescEn and _hotelLogo)."""
     if request.method == "POST":
         xlsx_file = request.FILES.get("file")
         if not xlsx_file:
@@ -97,151 +104,16 @@ def upload_xlsx_view(request):
             return redirect("upload")
 
         # Extract hotel name from file name
-        filename = xlsx_file.name
-        if "menu_data_" in filename:
-            hotel_name = filename.split("menu_data_")[-1].replace(".xlsx", "")
-        else:
-            hotel_name = filename.replace(".xlsx", "")
-        hotel_name = hotel_name.strip()
-
-        hotel, _ = Hotel.objects.get_or_create(name=hotel_name)
-
-        # Save file temporarily
-        tmp_dir = os.path.join(settings.MEDIA_ROOT, "temp")
-        os.makedirs(tmp_dir, exist_ok=True)
-        tmp_path = os.path.join(tmp_dir, xlsx_file.name)
+        hotel_name = hotel_name_from_filename(xlsx_file.name)
 
-        with open(tmp_path, "wb+") as dest:
-            for chunk in xlsx_file.chunks():
-                dest.write(chunk)
-
-        # Load workbook
-        try:
-            wb = load_workbook(tmp_path, data_only=True)
-        except Exception:
-            try:
-                df = pd.read_excel(tmp_path, engine="openpyxl")
-                df.to_excel(tmp_path, index=False, engine="openpyxl")
-                wb = load_workbook(tmp_path, data_only=True)
-            except Exception:
-                messages.error(request, "Invalid Excel file. Please re-save properly.")
-                return redirect("upload")
-
-        sheet = wb.active
-        imported = 0
-
-        # Read headers (lowercased)
-        headers = [str(cell.value).strip().lower() for cell in sheet[1] if cell.value]
-
-        def find_col(possible_names):
-            for name in possible_names:
-                if name in headers:
-                    return headers.index(name)
-            return None
+        mode = request.POST.get("mode", ImportJob.MODE_SYNC)
+        if mode not in dict(ImportJob.MODE_CHOICES):
+            messages.error(request, "Unknown import mode.")
+            return redirect("upload")
 
-        # Match your Excel headers
-        idx_name = find_col(["_nameen", "name", "item", "itemname"])
-        idx_price = find_col(["_finalprice", "_regularprice", "price", "regularprice"])
-        idx_category = find_col(["_categories", "category", "type"])
-        idx_description = find_col(["_shortdescen", "description", "desc", "details"])
-        idx_image = find_col(["_imageurl1", "image", "image_url", "imageurl"])
-        idx_logo = find_col(["_hotellogo", "logo", "hotel_logo"])
+        job = ImportJob.objects.create(hotel_name=hotel_name, file=xlsx_file, mode=mode, created_by=request.user)
 
-        # ✅ Handle hotel logo (first row only)
-        if idx_logo is not None:
-            try:
-                logo_val = sheet.cell(row=2, column=idx_logo + 1).value
-                if logo_val:
-                    logo_url = str(logo_val).strip()
-                    logo_local = download_image(logo_url, slugify(hotel_name) + "_logo")
-                    if logo_local:
-                        hotel.logo = logo_local
-                        hotel.save()
-            except Exception as e:
-                print(f"[Hotel Logo Error] {e}")
-
-        # Clear existing menu items for hotel
-        MenuItem.objects.filter(hotel=hotel).delete()
-
-        imported = 0
-        skipped = []
-
-        for i, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-            try:
-                name = row[idx_name] if idx_name is not None else None
-                if not name:
-                    skipped.append(f"Row {i}: No name")
-                    continue
-
-                name = str(name).strip()
-
-                # Price
-                price = None
-                if idx_price is not None and row[idx_price] is not None:
-                    try:
-                        price = float(row[idx_price])
-                    except:
-                        skipped.append(f"Row {i}: Invalid price")
-
-                # Category
-                categories = []
-                if idx_category is not None and row[idx_category] is not None:
-                    cat_cell = str(row[idx_category]).strip()
-                    if cat_cell:
-                        cat_names = [c.strip() for c in cat_cell.split(",") if c.strip()]
-                        for cat_name in cat_names:
-                            cat_obj, _ = Category.objects.get_or_create(name=cat_name)
-                            categories.append(cat_obj)
-
-                description = None
-                if idx_description is not None and row[idx_description]:
-                    description = str(row[idx_description]).strip()
-
-                image_url = None
-                if idx_image is not None and row[idx_image]:
-                    image_url = str(row[idx_image]).strip()
-
-                image_local = None
-                if image_url:
-                    image_local = download_image(image_url, slugify(hotel_name))
-
-                existing_item = MenuItem.objects.filter(hotel=hotel, item_name__iexact=name).first()
-
-                if existing_item:
-                    # Merge categories
-                    for cat in categories:
-                        existing_item.categories.add(cat)
-                    # Optionally update missing fields
-                    if not existing_item.description and description:
-                        existing_item.description = description
-                    if not existing_item.image_url and image_url:
-                        existing_item.image_url = image_url
-                    if not existing_item.image_local and image_local:
-                        existing_item.image_local = image_local
-                    if not existing_item.price and price:
-                        existing_item.price = price
-                    existing_item.save()
-                else:
-                    # Create new item
-                    item = MenuItem.objects.create(
-                        hotel=hotel,
-                        item_name=name,
-                        price=price,
-                        description=description,
-                        image_url=image_url,
-                        image_local=image_local,
-                    )
-                    if categories:
-                        item.categories.set(categories)
-                imported += 1
-            except Exception as e:
-                skipped.append(f"Row {i}: {e}")
-        print(f"✅ Imported {imported} items")
-        print(f"⚠️ Skipped rows: {skipped}")
-        wb.close()
-        os.remove(tmp_path)
-
-        messages.success(request, f"{imported} menu items imported for {hotel_name}.")
+        messages.success(request, f"Import of {hotel_name} queued (job #{job.pk}).")
         return redirect("dashboard")
 
     return render(request, "upload.html")
@@ -300,6 +172,8 @@ def add_menu_item_view(request, hotel_id):
 
             menu_item.save()
             form.save_m2m()
+            if menu_item.image_local:
+                refresh_item_variants(menu_item)
 
             messages.success(request, f"Menu item '{menu_item.item_name}' added successfully.")
             return redirect('hotel_menu', pk=hotel_id)
@@ -314,9 +188,7 @@ def edit_menu_item_view(request, hotel_id, item_id):
     hotel = get_object_or_404(Hotel, pk=hotel_id)
     menu_item = get_object_or_404(MenuItem, pk=item_id, hotel=hotel)
 
-    old_image_path = None
-    if menu_item.image_local:
-        old_image_path = os.path.join(settings.MEDIA_ROOT, str(menu_item.image_local))
+    old_image = str(menu_item.image_local) if menu_item.image_local else None
 
     if request.method == 'POST':
         form = MenuItemForm(request.POST, request.FILES, instance=menu_item)
@@ -326,10 +198,8 @@ def edit_menu_item_view(request, hotel_id, item_id):
             upload_file = form.cleaned_data.get('image_upload')
             image_url = form.cleaned_data.get('image_url')
 
-            # ✅ CASE 1: Uploaded file — delete old image and save new one
+            # ✅ CASE 1: Uploaded file — save new one (old image removed below if unused)
             if upload_file:
-                if old_image_path and os.path.exists(old_image_path):
-                    os.remove(old_image_path)
                 menu_item.image_local = upload_file
                 menu_item.image_url = ""
 
@@ -337,14 +207,19 @@ def edit_menu_item_view(request, hotel_id, item_id):
             elif image_url:
                 local_path = download_image(image_url, hotel.name)
                 if local_path:
-                    if old_image_path and os.path.exists(old_image_path):
-                        os.remove(old_image_path)
                     menu_item.image_local = local_path
                     menu_item.image_url = image_url
 
             menu_item.save()
             form.save_m2m()
 
+            if old_image != (menu_item.image_local.name or None) or (menu_item.image_local and not menu_item.image_variants):
+                refresh_item_variants(menu_item)
+
+            # Images are shared by content hash, only drop the old one if nothing else uses it
+            if old_image and old_image != str(menu_item.image_local):
+                delete_unreferenced_files([old_image])
+
             messages.success(request, f"Menu item '{menu_item.item_name}' updated successfully.")
             return redirect('hotel_menu', pk=hotel_id)
     else:
@@ -398,93 +273,6 @@ def edit_menu_item_view(request, hotel_id, item_id):
 #     return render(request, 'upload.html')
 
 
-# -----------------------------
-# XLSX parsing and import logic
-# -----------------------------
-@transaction.atomic
-def import_xlsx_to_db(filepath: str, hotel_name: str) -> dict:
-    """Parse an xlsx file and save Hotel and MenuItems. Returns dict with counts."""
-    wb = openpyxl.load_workbook(filepath, data_only=True)
-    sheet = wb.active
-
-    hotel, created = Hotel.objects.get_or_create(name=hotel_name)
-    hotel.menu_items.all().delete()
-
-    rows_processed = 0
-    items_created = 0
-
-    headers = [str(cell.value).strip().lower() if cell.value else '' for cell in sheet[1]]
-
-    def col_index(key_names):
-        for k in key_names:
-            if k in headers:
-                return headers.index(k)
-        return None
-
-    idx_item = col_index(['item', 'item_name', 'name'])
-    idx_price = col_index(['price', 'cost'])
-    idx_category = col_index(['category', 'type'])
-    idx_description = col_index(['description', 'desc', 'details', 'item_description'])  # ✅
-    idx_image = col_index(['image', 'image_url', 'image link', 'imageurl', 'image_link'])
-
-    for row in sheet.iter_rows(min_row=2, values_only=True):
-        rows_processed += 1
-        try:
-            item_name = row[idx_item] if idx_item is not None else None
-            if not item_name:
-                continue
-            item_name = str(item_name).strip()
-
-            price = None
-            if idx_price is not None and row[idx_price] is not None:
-                try:
-                    price = float(row[idx_price])
-                except Exception:
-                    price = None
-
-            category = str(row[idx_category]).strip() if idx_category is not None and row[idx_category] else None
-            description = str(row[idx_description]).strip() if idx_description is not None and row[idx_description] else None
-            image_url = str(row[idx_image]).strip() if idx_image is not None and row[idx_image] else None
-
-            image_local_rel = ''
-            if image_url:
-                image_local_rel = download_image(image_url, hotel_name)
-
-            obj, created_item = MenuItem.objects.get_or_create(
-                hotel=hotel,
-                item_name=item_name,
-                defaults={
-                    'price': price,
-                    'category': category,
-                    'description': description,
-                    'image_url': image_url,
-                    'image_local': image_local_rel,
-                }
-            )
-            if not created_item:
-                changed = False
-                for field, new_val in {
-                    'price': price,
-                    'category': category,
-                    'description': description,
-                    'image_url': image_url,
-                    'image_local': image_local_rel
-                }.items():
-                    if new_val and getattr(obj, field) != new_val:
-                        setattr(obj, field, new_val)
-                        changed = True
-                if changed:
-                    obj.save()
-            else:
-                items_created += 1
-        except Exception as e:
-            print(f"[Row Error] {e}")
-            continue
-
-    wb.close()
-    return {'rows_processed': rows_processed, 'items_created': items_created}
-
-
 # -----------------------------
 # API: Upload (token or api key protected)
 # -----------------------------
@@ -505,26 +293,47 @@ class UploadMenuAPI(APIView):
             return Response({'detail': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
         if not file.name.lower().endswith('.xlsx'):
             return Response({'detail': 'Only .xlsx allowed'}, status=status.HTTP_400_BAD_REQUEST)
+        mode = request.data.get('mode', ImportJob.MODE_SYNC)
+        if mode not in dict(ImportJob.MODE_CHOICES):
+            return Response({'detail': f"mode must be one of: {', '.join(dict(ImportJob.MODE_CHOICES))}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ImportJob.objects.create(
+            hotel_name=hotel_name_from_filename(file.name),
+            file=file,
+            mode=mode,
+            created_by=request.user,
+        )
+        return Response(
+            {
+                'hotel': job.hotel_name,
+                'job_id': job.pk,
+                'mode': job.mode,
+                'status': job.status,
+                'status_url': request.build_absolute_uri(reverse('api_import_job', args=[job.pk])),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
 
 
-        # Get hotel name from filename
-        fname = os.path.splitext(file.name)[0]
-        hotel_name = fname.replace('menu_data_', '').replace('menu-data-', '').strip()
-        if not hotel_name:
-            hotel_name = fname
+class MenuCacheStatsAPI(APIView):
+    """Hit/miss counters of the public menu response cache; DELETE resets them."""
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        stats = cache_stats()
+        lookups = stats["hits"] + stats["misses"]
+        return Response({**stats, "hit_ratio": round(stats["hits"] / lookups, 3) if lookups else None})
 
-        # Save temporary
-        tmp_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
-        os.makedirs(tmp_dir, exist_ok=True)
-        tmp_file = os.path.join(tmp_dir, slugify(file.name))
-        with open(tmp_file, 'wb') as dest:
-            for chunk in file.chunks():
-                dest.write(chunk)
+    def delete(self, request):
+        reset_cache_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-        result = import_xlsx_to_db(tmp_file, hotel_name)
-        return Response({'hotel': hotel_name, 'items_imported': result.get('items_created', 0), 'status': 'success'})
+class ImportJobStatusAPI(generics.RetrieveAPIView):
+    """Poll the progress of a queued menu import."""
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    permission_classes = (IsAuthenticated,)
 
 # -----------------------------
 # API: Mobile endpoints
@@ -536,7 +345,7 @@ class FifteenItemPagination(PageNumberPagination):
     max_page_size = 50
 
     def get_paginated_response(self, data):
-        total_pages = math.ceil(self.page.paginator.count / self.page_size)
+        total_pages = self.page.paginator.num_pages
         next_link = self.get_next_link()
         prev_link = self.get_previous_link()
 
@@ -550,142 +359,354 @@ class FifteenItemPagination(PageNumberPagination):
             'results': data
         })
 
-class UnifiedMenuAPI(ListAPIView):
+class KeysetPagination(BasePagination):
     """
-    Return menus filtered by time-based manual categories + uncategorized items.
-    - Menus WITH manual category: only shown if current time fits that category.
-    - Menus WITHOUT manual category: always shown.
+    Cursor pagination over a unique (column, id) ordering: a page is an
+    index range scan starting after the last row seen, so deep pages cost
+    the same as the first. The view names the ordering (keyset_ordering());
+    paginate_queryset returns the page's ids. The total is counted on the
+    first page only, and not at all with ?count=0. A cursor names the
+    ordering it was made for; one replayed under another ordering, or whose
+    key doesn't fit the columns, is a 404.
     """
-    permission_classes = [AllowAny]
-    pagination_class = FifteenItemPagination
+    page_size = 15
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
 
-    # --- Helper: get current Kuwait time-based active categories ---
-    def get_active_categories(self):
-        tz = pytz.timezone("Asia/Kuwait")
-        now = datetime.now(tz).time()
-        active = []
-
-        for cat in ManualCategory.objects.all():
-            parts = cat.name.split('-')
-            if len(parts) >= 3:
-                try:
-                    start = datetime.strptime(parts[-2].strip(), "%H:%M").time()
-                    end = datetime.strptime(parts[-1].strip(), "%H:%M").time()
-                except:
-                    continue
-
-                if start <= end:
-                    if start <= now <= end:
-                        active.append(cat.name)
-                else:
-                    # Cross-midnight (e.g., 22:00–02:00)
-                    if now >= start or now <= end:
-                        active.append(cat.name)
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def encode_cursor(self, key, reverse):
+        raw = json.dumps({'o': self.column, 'k': list(key), 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        """(key, reverse) of a cursor made for this ordering; NotFound for anything else."""
+        field = model._meta.get_field(self.column)
+        field = getattr(field, 'target_field', None) or field
+        expected = int if isinstance(field, IntegerField) else str
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            key, reverse = data['k'], bool(data['r'])
+            if data.get('o') != self.column or not isinstance(key, list) or len(key) != 2:
+                raise ValueError
+            # bool is an int subclass; neither it nor any other JSON type may reach the filters
+            if any(type(value) is not kind for value, kind in zip(key, (expected, int))):
+                raise ValueError
+        except (ValueError, TypeError, KeyError, AttributeError, binascii.Error):
+            raise NotFound('Invalid cursor.')
+        return key, reverse
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        column, _ = fields = view.keyset_ordering()
+        self.column = column
+        size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+
+        self.count = None
+        if not cursor and request.query_params.get('count', '1').lower() not in ('0', 'false', 'no'):
+            self.count = queryset.count()
+
+        key, reverse = self.decode_cursor(cursor, queryset.model) if cursor else (None, False)
+        op = 'lt' if reverse else 'gt'
+        if key is not None:
+            # (column, id) > key, written so the leading range can seek the index
+            queryset = queryset.filter(**{f'{column}__{op}e': key[0]}).filter(
+                Q(**{f'{column}__{op}': key[0]}) | Q(**{f'id__{op}': key[1]})
+            )
+        order = [f'-{f}' for f in fields] if reverse else list(fields)
+        rows = list(queryset.order_by(*order).values_list(*fields)[:size + 1])
 
-        print(f"[Kuwait Time {now.strftime('%H:%M')}] Active categories: {active}")
-        return active
+        more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+        self.has_next = key is not None if reverse else more
+        self.has_previous = more if reverse else key is not None
+        self.first, self.last = (rows[0], rows[-1]) if rows else (None, None)
+        return [pk for _, pk in rows]
 
-    # --- Core Query ---
-    def get_queryset(self):
-        items = (
-            MenuItem.objects.filter(is_visible=True)
-            .select_related("hotel")
-            .prefetch_related("manual_categories")
-        )
+    def get_link(self, key, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(key, reverse))
 
-        active_cats = self.get_active_categories()
+    def get_next_link(self):
+        return self.get_link(self.last, False) if self.has_next and self.last else None
 
-        # Use Q() to combine both conditions in one query instead of union
-        if active_cats:
-            items = items.filter(
-                Q(manual_categories__name__in=active_cats) | Q(manual_categories__isnull=True)
-            ).distinct()
-        else:
-            # If somehow no active categories are found, show all visible items
-            items = items.distinct()
+    def get_previous_link(self):
+        return self.get_link(self.first, True) if self.has_previous and self.first else None
+
+    def get_paginated_response(self, data):
+        next_link = self.get_next_link()
+        prev_link = self.get_previous_link()
+        return Response({
+            'count': self.count,
+            'has_next': bool(next_link),
+            'has_previous': bool(prev_link),
+            'next': next_link,
+            'previous': prev_link,
+            'results': data
+        })
+
+class SeededPagination(FifteenItemPagination):
+    """FifteenItemPagination for a SeededOrder: the seed is returned and carried in page links."""
 
-        return items
+    def paginate_queryset(self, queryset, request, view=None):
+        self.seed = queryset.seed
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_next_link(self):
+        link = super().get_next_link()
+        return replace_query_param(link, 'seed', self.seed) if link else None
+
+    def get_previous_link(self):
+        link = super().get_previous_link()
+        return replace_query_param(link, 'seed', self.seed) if link else None
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['seed'] = self.seed
+        return response
+
+class UnifiedMenuAPI(CachedMenuResponseMixin, ListAPIView):
+    """
+    Return menus filtered by time-based manual categories + uncategorized items.
+    - Menus WITH manual category: only shown if current time fits that category.
+    - Menus WITHOUT manual category: always shown.
+
+    Items come in a shuffled order fixed by `?seed=`: the first page picks a
+    seed and returns it, and the next/previous links reuse it, so paging is
+    consistent for as long as the menu is unchanged.
+    """
+    permission_classes = [AllowAny]
+    pagination_class = SeededPagination
+
+    def menu_validators(self, request, stamps):
+        # Without a seed the first page is a fresh shuffle every time
+        if 'seed' not in request.query_params:
+            return None
+        stamp = stamps[MenuVersion.GLOBAL]
+        active, since = active_window(stamp.version)
+        etag = self.make_etag(request, [stamp.version, sorted(active)])
+        return etag, max((d for d in (stamp.updated_at, since) if d), default=None)
 
     # --- Response builder ---
     def list(self, request, *args, **kwargs):
-        items = self.get_queryset()
-
-        # Group by item_name
-        grouped = defaultdict(list)
-        for item in items:
-            grouped[item.item_name.strip().lower()].append(item)
-
-        # Build unified list
-        unique_items = []
-        for item_name, menu_list in grouped.items():
-            first_item = menu_list[0]
-            hotel_data = [
-                {
-                    "hotel_name": m.hotel.name,
-                    "hotel_logo": request.build_absolute_uri(m.hotel.logo.url) if m.hotel.logo else None,
-                }
-                for m in menu_list
-            ]
-
-            unique_items.append({
-                "item_name": first_item.item_name,
-                "price": f"{float(first_item.price):.3f} KD" if first_item.price else None,
-                "description": first_item.description,
-                "image": request.build_absolute_uri(f"/media/{first_item.image_local}") if first_item.image_local else (
-                    request.build_absolute_uri(first_item.image_url) if first_item.image_url else None
-                ),
-                "manual_categories": [cat.name for cat in first_item.manual_categories.all()],
-                "hotels": hotel_data,
-            })
+        seed = request.query_params.get('seed')
+        if seed is None:
+            seed = new_seed()
+        else:
+            try:
+                seed = int(seed)
+                if not 0 <= seed < 2 ** 63:
+                    raise ValueError
+            except ValueError:
+                return Response({"error": "Invalid seed."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Shuffle results
-        random.shuffle(unique_items)
+        # Grouped once per menu version (menuapp.unified); a page only maps its own positions
+        stamp = getattr(self, 'menu_stamps', {}).get(MenuVersion.GLOBAL) or MenuVersion.current()
+        version = stamp.version
+        unique_items = SeededOrder(unified_snapshot(active_categories(version), version), seed)
 
-        # Paginate
         page = self.paginate_queryset(unique_items)
         if page is not None:
-            return self.get_paginated_response(page)
+            return self.get_paginated_response([present(entry, request) for entry in page])
+
+        return Response([present(entry, request) for entry in unique_items])
+
+
+class SyncAPI(APIView):
+    """
+    Delta sync for mobile caches: GET /api/sync/ for a full copy, then
+    /api/sync/?since=<token from the previous response> for only what changed
+    or was deleted since. Optional ?hotel=<id> limits items to one hotel.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            since = parse_token(request.query_params['since']) if request.query_params.get('since') else None
+            hotel_id = int(request.query_params['hotel']) if request.query_params.get('hotel') else None
+        except (ValueError, OverflowError, OSError):
+            return Response({"error": "Invalid since token or hotel id."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(changes_since(since, request, hotel_id=hotel_id))
 
-        return Response(unique_items)
 
+class MenuSearchAPI(ListAPIView):
+    """
+    Full-text search over visible menu items (name, description, category
+    names) with prefix matching, best matches first. ?q= is required;
+    optional ?hotel=<id> and ?category=<id> filters; paginated like the
+    unified menu.
+    """
+    permission_classes = [AllowAny]
+    pagination_class = FifteenItemPagination
+
+    def list(self, request, *args, **kwargs):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"error": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            hotel_id = int(request.query_params['hotel']) if request.query_params.get('hotel') else None
+            category_id = int(request.query_params['category']) if request.query_params.get('category') else None
+        except ValueError:
+            return Response({"error": "hotel and category must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ranked ids from the FTS5 index (menuapp.search); only the page is read
+        ids = self.paginate_queryset(SearchResults(text, hotel_id=hotel_id, category_id=category_id))
+        items = {item['id']: item for item in serialize_menu_items(MenuItem.objects.filter(pk__in=ids), request)}
+        hotels = {
+            pk: {'hotel_id': hotel_id, 'hotel_name': name}
+            for pk, hotel_id, name in MenuItem.objects.filter(pk__in=ids).values_list('pk', 'hotel_id', 'hotel__name')
+        }
+        results = [{**items[pk], **hotels[pk]} for pk in ids if pk in items]
+        return self.get_paginated_response(results)
+
+
+class OptionalPagination(FifteenItemPagination):
+    """FifteenItemPagination only when the client asks for it with ?page= or ?page_size=."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param not in request.query_params and self.page_size_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
 
-class HotelListAPI(generics.ListAPIView):
-    queryset = Hotel.objects.all().order_by('-uploaded_at')
+    def get_previous_link(self):
+        if not self.page.has_previous():
+            return None
+        # Keep ?page=1 explicit: without it the list comes back unpaginated
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page.previous_page_number())
+
+
+class HotelListAPI(CachedMenuResponseMixin, generics.ListAPIView):
+    """
+    Hotels with their item counts, computed in the same query. Pass ?page=
+    to paginate and ?counts=0 to leave the counts out.
+    """
     serializer_class = HotelSerializer
     permission_classes = (AllowAny,)
+    pagination_class = OptionalPagination
+
+    def include_counts(self):
+        return self.request.query_params.get('counts', '1').lower() not in ('0', 'false', 'no')
+
+    def get_queryset(self):
+        hotels = Hotel.objects.order_by('-uploaded_at', '-pk')
+        if self.include_counts():
+            hotels = hotels.annotate(
+                menu_count=Count('menu_items'),
+                visible_menu_count=Count('menu_items', filter=Q(menu_items__is_visible=True)),
+            )
+        return hotels
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'include_counts': self.include_counts()}
 
 
 
 
-class HotelMenuAPI(generics.RetrieveAPIView):
+class HotelMenuAPI(CachedMenuResponseMixin, generics.RetrieveAPIView):
     queryset = Hotel.objects.all()
     serializer_class = HotelDetailSerializer
     permission_classes = (AllowAny,)
 
+    def menu_version_keys(self, request, *args, **kwargs):
+        return [MenuVersion.hotel_key(kwargs['pk']), MenuVersion.CATEGORIES]
+
+
+class HotelMenusAPI(MenuVersionConditionalMixin, APIView):
+    """
+    Several hotels' menus in one request: GET /api/hotels/menus/?ids=1,2,3
+    returns {"hotels": {"<id>": <same as /api/hotel/<id>/menu/>}, "missing": [...]}.
+    Hotels are loaded chunk_size at a time with a fixed number of queries per
+    chunk, and the body is streamed out chunk by chunk.
+    """
+    permission_classes = (AllowAny,)
+
+    max_ids = 50
+    chunk_size = 10
+
+    def get(self, request, *args, **kwargs):
+        try:
+            ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()]
+        except ValueError:
+            return Response({"error": "ids must be a comma-separated list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({"error": "ids is required."}, status=status.HTTP_400_BAD_REQUEST)
+        self.hotel_ids = list(dict.fromkeys(ids))
+        if len(self.hotel_ids) > self.max_ids:
+            return Response({"error": f"At most {self.max_ids} ids per request."}, status=status.HTTP_400_BAD_REQUEST)
+        return super().get(request, *args, **kwargs)
+
+    def menu_version_keys(self, request, *args, **kwargs):
+        return [*(MenuVersion.hotel_key(pk) for pk in self.hotel_ids), MenuVersion.CATEGORIES]
+
+    def menu_response(self, request, *args, **kwargs):
+        return StreamingHttpResponse(self.stream(request), content_type='application/json')
+
+    def stream(self, request):
+        render = FastJSONRenderer().render
+        found = set()
+        yield b'{"hotels":{'
+        for start in range(0, len(self.hotel_ids), self.chunk_size):
+            chunk = self.hotel_ids[start:start + self.chunk_size]
+            context = {'request': request, 'menus': menus_by_hotel(chunk, request)}
+            hotels = Hotel.objects.filter(pk__in=chunk)
+            for hotel in HotelDetailSerializer(hotels, many=True, context=context).data:
+                yield (b',' if found else b'') + render(str(hotel['id'])) + b':' + render(hotel)
+                found.add(hotel['id'])
+        yield b'},"missing":' + render([pk for pk in self.hotel_ids if pk not in found]) + b'}'
+
 
 class MenuAllAPI(generics.ListAPIView):
-    serializer_class = MenuItemSerializer
+    """
+    Visible menu items in name order (?order=hotel: by hotel), paged with
+    ?cursor= links. Optional ?hotel=<id>; ?count=0 leaves out the total.
+    """
     permission_classes = (AllowAny,)
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetPagination
+
+    def keyset_ordering(self):
+        return ('hotel_id', 'id') if self.request.query_params.get('order') == 'hotel' else ('item_name', 'id')
 
     def get_queryset(self):
-        return MenuItem.objects.select_related('hotel').filter(is_visible=True).order_by('item_name')
+        items = MenuItem.objects.filter(is_visible=True)
+        hotel_id = self.request.query_params.get('hotel')
+        return items.filter(hotel_id=hotel_id) if hotel_id else items
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('hotel') and not request.query_params['hotel'].isdigit():
+            return Response({"error": "hotel must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        ids = self.paginate_queryset(self.get_queryset())
+        items = {item['id']: item for item in serialize_menu_items(MenuItem.objects.filter(pk__in=ids), request)}
+        return self.get_paginated_response([items[pk] for pk in ids if pk in items])
 
 
 class MenuRandomAPI(views.APIView):
     permission_classes = (AllowAny,)
 
+    max_count = 100
+
     def get(self, request, format=None):
-        count = int(request.GET.get('count', 10))
-        qs = list(MenuItem.objects.select_related('hotel').all())
-        total = len(qs)
-        if total == 0:
+        """Random visible items; optional ?hotel=<id> and ?category=<id> filters."""
+        try:
+            count = min(int(request.GET.get('count', 10)), self.max_count)
+            hotel_id = int(request.GET['hotel']) if request.GET.get('hotel') else None
+            category_id = int(request.GET['category']) if request.GET.get('category') else None
+        except ValueError:
+            return Response({"error": "count, hotel and category must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Drawn from a cached id index (menuapp.sampling); only the chosen rows are loaded
+        chosen = sample_items(max(count, 0), hotel_id=hotel_id, category_id=category_id)
+        if not chosen:
             return Response({'items': []})
-        if count >= total:
-            chosen = qs
-        else:
-            # random sample
-            chosen = sample(qs, min(count, total))
         serializer = MenuItemSerializer(chosen, many=True, context={'request': request})
         return Response({'count': len(chosen), 'items': serializer.data})
     
@@ -700,7 +721,7 @@ class ToggleVisibilityAPI(APIView):
             item = MenuItem.objects.get(pk=pk)
             visible = request.data.get("visible", True)
             item.is_visible = bool(visible)
-            item.save()
+            item.save(update_fields=["is_visible", "updated_at"])
             return Response({"status": "success", "visible": item.is_visible})
         except MenuItem.DoesNotExist:
             return Response({"error": "Menu item not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -714,10 +735,14 @@ def create_manual_category(request):
         return JsonResponse({"error": "Category name cannot be empty."}, status=400)
 
     category, created = ManualCategory.objects.get_or_create(name__iexact=name, defaults={"name": name})
+    window = {
+        "start_time": category.start_time.strftime("%H:%M") if category.start_time else None,
+        "end_time": category.end_time.strftime("%H:%M") if category.end_time else None,
+    }
     if created:
-        return JsonResponse({"status": "success", "id": category.id, "name": category.name})
+        return JsonResponse({"status": "success", "id": category.id, "name": category.name, **window})
     else:
-        return JsonResponse({"status": "exists", "id": category.id, "name": category.name})
+        return JsonResponse({"status": "exists", "id": category.id, "name": category.name, **window})
 
 class UpdateMenuCategoryAPI(APIView):
     permission_classes = [IsAuthenticated]
@@ -746,26 +771,38 @@ class UpdateMenuCategoryAPI(APIView):
                     item.manual_categories.set([category])
                 else:
                     item.manual_categories.clear()
-            item.save()
+            # Only links changed; the m2m_changed handlers stamp the item and bump versions
             return Response({"status": "success"})
         except Exception as e:
             return Response({"error": str(e)}, status=400)
         
+class BatchMenuEditAPI(APIView):
+    """
+    Several edits in one request and one transaction:
+    POST {"ops": [{"op": "visibility", "ids": [...], "visible": false},
+                  {"op": "categories", "ids": [...], "type": "manual", "category_ids": [...]},
+                  {"op": "delete", "ids": [...]}]}
+    Ops run in order with set-based writes (menuapp.edits); the response has
+    one result per op. Nothing is applied if any op is invalid.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            ops = parse_ops(request.data.get("ops"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"results": apply_menu_edits(ops)})
+
+
 class DeleteMenuItemAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            item = MenuItem.objects.get(pk=pk)
-            # delete local image if exists
-            if item.image_local:
-                file_path = os.path.join(settings.MEDIA_ROOT, str(item.image_local))
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            item.delete()
-            return Response({"success": True})
-        except MenuItem.DoesNotExist:
+        # The image goes later (menuapp.deletion), and only if no other item/hotel shares it
+        if not delete_menu_items([pk])["deleted"]:
             return Response({"error": "Menu item not found"}, status=404)
+        return Response({"success": True})
 
 
 class BulkDeleteMenuItemsAPI(APIView):
@@ -773,47 +810,43 @@ class BulkDeleteMenuItemsAPI(APIView):
 
     def post(self, request):
         ids = request.data.get("ids", [])
-        deleted = 0
+        try:
+            # A string is iterable too: "12" must not mean items 1 and 2
+            if not isinstance(ids, list):
+                raise TypeError
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be a list of integers."}, status=status.HTTP_400_BAD_REQUEST)
 
-        for pk in ids:
-            try:
-                item = MenuItem.objects.get(pk=pk)
-                if item.image_local:
-                    file_path = os.path.join(settings.MEDIA_ROOT, str(item.image_local))
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                item.delete()
-                deleted += 1
-            except MenuItem.DoesNotExist:
-                continue
-
-        return Response({"deleted": deleted})
+        # One DELETE per table; unreferenced images are removed after commit
+        return Response(delete_menu_items(ids))
 
 class DeleteHotelAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
         """Delete a hotel and all associated menu items + images"""
-        try:
-            hotel = Hotel.objects.get(pk=pk)
-
-            # Delete all menu images related to this hotel
-            for item in hotel.menu_items.all():
-                if item.image_local:
-                    file_path = os.path.join(settings.MEDIA_ROOT, str(item.image_local))
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                item.delete()
-
-            # Delete hotel logo if exists
-            if hotel.logo:
-                logo_path = os.path.join(settings.MEDIA_ROOT, str(hotel.logo))
-                if os.path.exists(logo_path):
-                    os.remove(logo_path)
-
-            hotel.delete()
-            return Response({"success": True, "message": f"Hotel '{hotel.name}' and all menus deleted."})
-        except Hotel.DoesNotExist:
+        name = Hotel.objects.filter(pk=pk).values_list("name", flat=True).first()
+        if name is None:
             return Response({"error": "Hotel not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            # Images (and the logo) that no other hotel shares are removed after commit
+            result = delete_hotels([pk])
+            return Response({
+                "success": True,
+                "message": f"Hotel '{name}' and all menus deleted.",
+                "items_deleted": result["items"],
+                "images_queued": result["images_queued"],
+            })
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def serve_content_addressed(request, path):
+    """
+    Serve content-addressed media (development only; nginx should do the same
+    for /media/images/). The name is the hash of the bytes, so it never changes.
+    """
+    response = serve(request, f"{CONTENT_PREFIX}/{path}", document_root=settings.MEDIA_ROOT)
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response